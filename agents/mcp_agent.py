@@ -1,35 +1,142 @@
+import argparse
 import asyncio
+import json
 import sys
+import time
 from pathlib import Path
+from typing import Optional
 
 from agents.agent import Agent
+from agents.lifecycle import RunHooks
 from agents.mcp import MCPServerStdio
 from agents.run import Runner
 
-INSTRUCTIONS = """Run tests, lint, and typecheck in that order. Quote failing log excerpts, retry up to three cycles with minimal unified diffs, block infra/, db/migrations/, and secrets paths, validate diffs with git apply --check, and finish with git commit --no-verify. Report in SUMMARY, PLAN, PATCH, COMMANDS_RAN, RESULTS, CHECKS, NEXT_STEPS order."""
+INSTRUCTIONS = """Call describe_project to learn the project layout, then run tests, lint, and typecheck together with run_all_checks (results are cached per working tree; pass force=true only to rerun a suspected flaky check). Quote the failing diagnostics (file, line, rule, message), page through them with offset when next_offset is set, and only fetch raw output with raw=true or read_log and the returned run_id when the diagnostics are not enough (cached results without a run_id need force=true to capture a new log), retry up to three cycles with minimal unified diffs (after a patch, run_tests with affected=true runs only the tests that depend on the changed files, and shards=N splits a suite that times out across parallel workers), block infra/, db/migrations/, and secrets paths, validate diffs with git apply --check, and finish with git commit --no-verify. Report in SUMMARY, PLAN, PATCH, COMMANDS_RAN, RESULTS, CHECKS, NEXT_STEPS order."""
+
+TASK = "Run the project's full test suite and, if anything fails, fix it with minimal patches so all checks pass."
 
 PROJECT_ROOT = Path("Calendar/work/20250917_work")
+DEFAULT_CONCURRENCY = 4
+TOOL_TIMEOUT_SEC = 900
 
 
-async def main() -> None:
+class TimingHooks(RunHooks):
+    def __init__(self):
+        self.llm_started: list[float] = []
+        self.tool_started: dict[str, list[float]] = {}
+        self.llm_turns_ms: list[float] = []
+        self.tool_calls: list[dict] = []
+
+    async def on_llm_start(self, context, agent, system_prompt, input_items) -> None:
+        self.llm_started.append(time.perf_counter())
+
+    async def on_llm_end(self, context, agent, response) -> None:
+        if self.llm_started:
+            self.llm_turns_ms.append(round((time.perf_counter() - self.llm_started.pop(0)) * 1000, 1))
+
+    async def on_tool_start(self, context, agent, tool) -> None:
+        self.tool_started.setdefault(tool.name, []).append(time.perf_counter())
+
+    async def on_tool_end(self, context, agent, tool, result) -> None:
+        started = self.tool_started.get(tool.name)
+        if started:
+            self.tool_calls.append({"tool": tool.name, "ms": round((time.perf_counter() - started.pop(0)) * 1000, 1)})
+
+    def summary(self) -> dict:
+        tools: dict[str, dict] = {}
+        for call in self.tool_calls:
+            entry = tools.setdefault(call["tool"], {"calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+            entry["calls"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + call["ms"], 1)
+            entry["max_ms"] = max(entry["max_ms"], call["ms"])
+        return {
+            "llm_turns": len(self.llm_turns_ms),
+            "llm_total_ms": round(sum(self.llm_turns_ms), 1),
+            "llm_max_ms": max(self.llm_turns_ms, default=0.0),
+            "tool_total_ms": round(sum(call["ms"] for call in self.tool_calls), 1),
+            "tools": tools,
+        }
+
+
+def build_server(project_root: Optional[Path] = None, require_project: bool = False) -> MCPServerStdio:
     env = {"PYTHONUNBUFFERED": "1"}
-    if PROJECT_ROOT.exists():
-        env["TESTOPS_PROJECT_ROOT"] = str(PROJECT_ROOT.resolve())
-    server = MCPServerStdio(
+    if project_root is not None:
+        env["TESTOPS_PROJECT_ROOT"] = str(project_root.resolve())
+    if require_project:
+        env["TESTOPS_REQUIRE_PROJECT"] = "1"
+    return MCPServerStdio(
         {
             "command": sys.executable,
             "args": ["-u", "mcp_servers/testops_server.py"],
             "env": env,
-        }
+        },
+        cache_tools_list=True,
+        client_session_timeout_seconds=TOOL_TIMEOUT_SEC,
     )
+
+
+async def main() -> None:
+    server = build_server(PROJECT_ROOT if PROJECT_ROOT.exists() else None)
     async with server:
         agent = Agent(name="TestOpsAgent", instructions=INSTRUCTIONS, mcp_servers=[server])
-        result = await Runner.run(
-            agent,
-            "Run the project's full test suite and, if anything fails, fix it with minimal patches so all checks pass.",
-        )
-        print(result.output)
+        hooks = TimingHooks()
+        result = await Runner.run(agent, TASK, hooks=hooks)
+        print(result.final_output)
+        print(json.dumps({"timings": hooks.summary()}), file=sys.stderr)
+
+
+async def run_project(server: MCPServerStdio, root: Path, semaphore: asyncio.Semaphore) -> dict:
+    async with semaphore:
+        started = time.perf_counter()
+        agent = Agent(name="TestOpsAgent", instructions=INSTRUCTIONS, mcp_servers=[server])
+        task = f'{TASK}\nThe project root is {root}. Pass project="{root}" to every TestOps tool call.'
+        hooks = TimingHooks()
+        try:
+            result = await Runner.run(agent, task, hooks=hooks)
+        except Exception as exc:
+            # One failing project must not abort the rest of the batch.
+            return {
+                "project": str(root),
+                "status": "error",
+                "duration_sec": round(time.perf_counter() - started, 3),
+                "error": f"{type(exc).__name__}: {exc}",
+                "timings": hooks.summary(),
+            }
+        return {
+            "project": str(root),
+            "status": "completed",
+            "duration_sec": round(time.perf_counter() - started, 3),
+            "output": result.final_output,
+            "timings": hooks.summary(),
+        }
+
+
+async def main_batch(project_roots: list[Path], concurrency: int = DEFAULT_CONCURRENCY) -> dict:
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    server = build_server(require_project=True)
+    async with server:
+        reports = await asyncio.gather(*(run_project(server, root.resolve(), semaphore) for root in project_roots))
+    return {
+        "duration_sec": round(time.perf_counter() - started, 3),
+        "concurrency": concurrency,
+        "completed": sum(report["status"] == "completed" for report in reports),
+        "failed": sum(report["status"] != "completed" for report in reports),
+        "projects": reports,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the TestOps agent on one or more projects.")
+    parser.add_argument("projects", nargs="*", type=Path, help="project roots to check through one shared server")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    if args.projects:
+        report = asyncio.run(main_batch(args.projects, args.concurrency))
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        asyncio.run(main())
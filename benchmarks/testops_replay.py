@@ -0,0 +1,230 @@
+import argparse
+import asyncio
+import contextlib
+import inspect
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+SERVER_DIR = Path(__file__).resolve().parent.parent / "mcp_servers"
+DEFAULT_MODULES = 20
+DEFAULT_REPEAT = 1
+DEFAULT_SEQUENCE = [
+    {"tool": "describe_project", "args": {}},
+    {"tool": "run_all_checks", "args": {}},
+    {"tool": "_touch", "args": {"module": 0}},
+    {"tool": "run_tests", "args": {"affected": True}},
+    {"tool": "run_all_checks", "args": {}},
+    {"tool": "describe_project", "args": {}},
+]
+
+
+def git(root: Path, *args: str) -> None:
+    subprocess.run(
+        ["git", "-c", "user.name=bench", "-c", "user.email=bench@example.invalid", *args],
+        cwd=root,
+        check=True,
+        capture_output=True,
+    )
+
+
+def write_files(root: Path, files: dict[str, str]) -> None:
+    for relative, content in files.items():
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+
+
+def python_fixture(root: Path, modules: int) -> None:
+    files = {
+        "pytest.ini": "[pytest]\ntestpaths = tests\npythonpath = .\n",
+        "pyproject.toml": '[project]\nname = "bench-fixture"\nversion = "0.0.0"\n',
+        "pkg/__init__.py": "",
+    }
+    for index in range(modules):
+        dependency = f"from pkg.mod_{index - 1} import value_{index - 1}\n\n\n" if index else ""
+        previous = f"value_{index - 1}(x) + " if index else ""
+        files[f"pkg/mod_{index}.py"] = f"{dependency}def value_{index}(x: int) -> int:\n    return {previous}x + {index}\n"
+        files[f"tests/test_mod_{index}.py"] = (
+            f"from pkg.mod_{index} import value_{index}\n\n\n"
+            f"def test_value_{index}():\n    assert value_{index}(0) == {sum(range(index + 1))}\n"
+        )
+    write_files(root, files)
+
+
+def typescript_fixture(root: Path, modules: int) -> None:
+    package = {
+        "name": "bench-fixture",
+        "private": True,
+        "type": "module",
+        "scripts": {"test": "vitest run", "lint": "eslint .", "typecheck": "tsc --noEmit"},
+        "devDependencies": {
+            "eslint": "^9.0.0",
+            "typescript": "^5.4.0",
+            "typescript-eslint": "^8.0.0",
+            "vitest": "^1.6.0",
+        },
+    }
+    tsconfig = {
+        "compilerOptions": {
+            "target": "ES2020",
+            "module": "ESNext",
+            "moduleResolution": "Bundler",
+            "strict": True,
+            "noEmit": True,
+            "baseUrl": ".",
+            "paths": {"@/*": ["lib/*"]},
+        },
+        "include": ["lib", "tests"],
+    }
+    files = {
+        "package.json": json.dumps(package, indent=2) + "\n",
+        "tsconfig.json": json.dumps(tsconfig, indent=2) + "\n",
+        "vitest.config.ts": (
+            'import { fileURLToPath } from "node:url";\nimport { defineConfig } from "vitest/config";\n\n'
+            'export default defineConfig({\n  resolve: { alias: { "@": fileURLToPath(new URL("./lib", import.meta.url)) } },\n'
+            "});\n"
+        ),
+        "eslint.config.js": (
+            'import tseslint from "typescript-eslint";\n\n'
+            'export default tseslint.config({ ignores: ["node_modules/"] }, ...tseslint.configs.recommended);\n'
+        ),
+        ".gitignore": "node_modules/\n",
+    }
+    for index in range(modules):
+        dependency = f'import {{ value{index - 1} }} from "./mod{index - 1}";\n\n' if index else ""
+        previous = f"value{index - 1}(x) + " if index else ""
+        files[f"lib/mod{index}.ts"] = f"{dependency}export function value{index}(x: number): number {{\n  return {previous}x + {index};\n}}\n"
+        files[f"tests/mod{index}.test.ts"] = (
+            f'import {{ expect, test }} from "vitest";\nimport {{ value{index} }} from "@/mod{index}";\n\n'
+            f'test("value{index}", () => {{\n  expect(value{index}(0)).toBe({sum(range(index + 1))});\n}});\n'
+        )
+    write_files(root, files)
+
+
+FIXTURES = {"python": python_fixture, "typescript": typescript_fixture}
+
+
+def build_fixture(kind: str, base: Path, modules: int, install: bool) -> Path:
+    root = base / f"{kind}-{modules}"
+    FIXTURES[kind](root, modules)
+    if install and kind == "typescript":
+        subprocess.run(["npm", "install", "--no-audit", "--no-fund"], cwd=root, check=True, capture_output=True)
+    git(root, "init", "-q")
+    git(root, "add", "-A")
+    git(root, "commit", "-q", "-m", "fixture")
+    return root
+
+
+def touch_module(root: Path, module: int) -> str:
+    candidates = sorted((root / "pkg").glob(f"mod_{module}.py")) + sorted((root / "lib").glob(f"mod{module}.ts"))
+    if not candidates:
+        raise RuntimeError(f"fixture has no module {module}")
+    path = candidates[0]
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write("\n")
+    return str(path.relative_to(root))
+
+
+def load_sequence(path: Optional[Path]) -> list[dict]:
+    if path is None:
+        return DEFAULT_SEQUENCE
+    steps = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        event = json.loads(line)
+        # Accept raw TESTOPS_METRICS_FILE dumps: only tool events are replayable.
+        if event.get("event", "tool") != "tool":
+            continue
+        args = {key: value for key, value in event.get("args", {}).items() if key != "project"}
+        if any(isinstance(value, dict) and "omitted_chars" in value for value in args.values()):
+            # Large arguments such as diff bodies are not logged, so these calls cannot be replayed.
+            continue
+        steps.append({"tool": event["tool"], "args": args})
+    return steps
+
+
+async def replay(testops, root: Path, sequence: list[dict]) -> list[dict]:
+    results = []
+    for step in sequence:
+        started = time.perf_counter()
+        outcome = {"tool": step["tool"], "args": step["args"]}
+        try:
+            if step["tool"] == "_touch":
+                outcome["touched"] = touch_module(root, **step["args"])
+            else:
+                tool = getattr(testops, step["tool"])
+                args = dict(step["args"])
+                if "project" in inspect.signature(tool).parameters:
+                    args["project"] = str(root)
+                response = await tool(**args)
+                outcome["cached"] = response.get("cached") if isinstance(response, dict) else None
+            outcome["ok"] = True
+        except Exception as exc:
+            outcome["ok"] = False
+            outcome["error"] = str(exc)[:500]
+        outcome["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        results.append(outcome)
+    return results
+
+
+async def run_benchmark(args: argparse.Namespace, workdir: Path) -> dict:
+    # The server reads its configuration at import time, so isolate the cache before importing it.
+    os.environ.setdefault("TESTOPS_CACHE_DIR", str(workdir / "cache"))
+    if args.metrics_file:
+        os.environ["TESTOPS_METRICS_FILE"] = str(args.metrics_file)
+    if not args.install:
+        # Keep npx from timing a package download when the fixture has no node_modules.
+        os.environ.setdefault("npm_config_offline", "true")
+    sys.path.insert(0, str(SERVER_DIR))
+    import testops_server
+
+    sequence = load_sequence(args.sequence)
+    report = {"modules": args.modules, "repeat": args.repeat, "fixtures": {}}
+    for kind in args.fixtures:
+        root = build_fixture(kind, workdir, args.modules, args.install)
+        testops_server.METRICS.reset()
+        runs = [await replay(testops_server, root, sequence) for _ in range(args.repeat)]
+        report["fixtures"][kind] = {
+            "root": str(root),
+            "runs": runs,
+            "total_ms": round(sum(step["duration_ms"] for run in runs for step in run), 1),
+            "metrics": testops_server.METRICS.snapshot(),
+        }
+    return report
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay TestOps tool-call sequences against generated fixture repos.")
+    parser.add_argument("--fixtures", nargs="+", choices=sorted(FIXTURES), default=["python"])
+    parser.add_argument("--modules", type=int, default=DEFAULT_MODULES, help="source modules (and tests) per fixture")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="replays of the sequence per fixture")
+    parser.add_argument("--sequence", type=Path, help="JSONL of tool events, e.g. a TESTOPS_METRICS_FILE dump")
+    parser.add_argument("--metrics-file", type=Path, help="append the server's JSONL events here")
+    parser.add_argument("--install", action="store_true", help="npm install the TypeScript fixture")
+    parser.add_argument("--output", type=Path, help="write the report here instead of stdout")
+    parser.add_argument("--keep", action="store_true", help="keep the generated fixtures and cache for inspection")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.keep:
+        workdir = contextlib.nullcontext(tempfile.mkdtemp(prefix="testops-bench-"))
+    else:
+        workdir = tempfile.TemporaryDirectory(prefix="testops-bench-")
+    with workdir as tmp:
+        if args.keep:
+            print(f"keeping fixtures in {tmp}", file=sys.stderr)
+        report = asyncio.run(run_benchmark(args, Path(tmp)))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
@@ -1,13 +1,65 @@
 import asyncio
+import bisect
+import contextlib
+import fnmatch
+import functools
+import hashlib
+import heapq
 import json
+import linecache
 import os
+import posixpath
+import re
 import shutil
+import signal
+import sqlite3
+import tempfile
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from contextvars import ContextVar
 from pathlib import Path
-from typing import Optional
+from typing import Awaitable, Callable, Iterable, Optional, Union
 
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
 
 MAX_LOG_CHARS = 200_000
+TAIL_BYTES = 16_384
+READ_CHUNK_BYTES = 65_536
+PROGRESS_MESSAGE_CHARS = 200
+KILL_GRACE_SEC = 5
+EXIT_POLL_SEC = 0.05
+MAX_SPOOLED_RUNS = 50
+SPOOL_ROOT = Path(tempfile.gettempdir()) / "testops-logs"
+SPOOL_DIR = SPOOL_ROOT / str(os.getpid())
+SPOOL_MAX_AGE_SEC = 24 * 3600
+CACHE_DIR = Path(os.environ.get("TESTOPS_CACHE_DIR") or Path.home() / ".cache" / "testops")
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_MAX_AGE_SEC = 7 * 24 * 3600
+CACHE_VERSION = 2
+TIMINGS_DB = CACHE_DIR / "timings.sqlite3"
+TIMING_SMOOTHING = 0.5
+DEFAULT_TEST_FILE_SEC = 1.0
+TEST_LIST_TIMEOUT_SEC = 120
+MAX_PROFILE_ENTRIES = 200_000
+DAEMON_MODE = os.environ.get("TESTOPS_DAEMON", "").lower() in ("1", "true", "yes")
+REQUIRE_PROJECT = os.environ.get("TESTOPS_REQUIRE_PROJECT", "").lower() in ("1", "true", "yes")
+WORKER_IDLE_SEC = int(os.environ.get("TESTOPS_WORKER_IDLE_SEC", "900"))
+WORKER_MAX_RSS_BYTES = int(os.environ.get("TESTOPS_WORKER_MAX_RSS_MB", "2048")) * 1024 * 1024
+WORKER_SETTLE_SEC = 1.0
+WORKER_HEALTH_INTERVAL_SEC = 15
+WORKER_MAX_RESTARTS = 5
+WORKER_LINE_LIMIT = 1024 * 1024
+MAX_DIAGNOSTICS = 5_000
+DIAGNOSTIC_MESSAGE_CHARS = 500
+SNIPPET_CHARS = 160
+FALLBACK_TAIL_CHARS = 4_000
+METRICS_FILE = os.environ.get("TESTOPS_METRICS_FILE")
+METRICS_ARG_CHARS = 200
+RSS_SAMPLE_SEC = 0.25
+TIME_BUCKETS_MS = (10, 50, 100, 250, 500, 1_000, 2_500, 5_000, 10_000, 30_000, 60_000, 300_000)
+SIZE_BUCKETS_BYTES = (1 << 10, 1 << 14, 1 << 17, 1 << 20, 1 << 24, 1 << 27, 1 << 30, 1 << 32)
 DEFAULT_ROOT = Path(__file__).resolve().parent.parent
 
 
@@ -21,90 +73,1858 @@ def resolve_root() -> Path:
     return DEFAULT_ROOT
 
 
+@contextlib.asynccontextmanager
+async def server_lifespan(_server: FastMCP):
+    purge_stale_spools()
+    monitor = asyncio.create_task(SUPERVISOR.monitor()) if DAEMON_MODE else None
+    try:
+        yield {}
+    finally:
+        if monitor is not None:
+            monitor.cancel()
+        await SUPERVISOR.shutdown()
+        _RUN_LOGS.clear()
+        shutil.rmtree(SPOOL_DIR, ignore_errors=True)
+
+
 ROOT = resolve_root()
-server = FastMCP("TestOps")
+server = FastMCP("TestOps", lifespan=server_lifespan)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.counters: dict[str, int] = {}
+        self.histograms: dict[str, dict] = {}
+        self.since = time.time()
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name: str, value: float, buckets: tuple = TIME_BUCKETS_MS) -> None:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = {
+                "bounds": buckets,
+                "counts": [0] * (len(buckets) + 1),
+                "count": 0,
+                "sum": 0.0,
+                "min": value,
+                "max": value,
+            }
+        histogram["counts"][bisect.bisect_left(histogram["bounds"], value)] += 1
+        histogram["count"] += 1
+        histogram["sum"] += value
+        histogram["min"] = min(histogram["min"], value)
+        histogram["max"] = max(histogram["max"], value)
+
+    def snapshot(self) -> dict:
+        histograms = {}
+        for name, histogram in sorted(self.histograms.items()):
+            labels = [f"le_{bound}" for bound in histogram["bounds"]] + ["inf"]
+            histograms[name] = {
+                "count": histogram["count"],
+                "sum": round(histogram["sum"], 3),
+                "mean": round(histogram["sum"] / histogram["count"], 3),
+                "min": round(histogram["min"], 3),
+                "max": round(histogram["max"], 3),
+                "buckets": {label: count for label, count in zip(labels, histogram["counts"]) if count},
+            }
+        return {
+            "since": self.since,
+            "uptime_sec": round(time.time() - self.since, 3),
+            "counters": dict(sorted(self.counters.items())),
+            "histograms": histograms,
+        }
+
+
+METRICS = MetricsRegistry()
+
+
+def record_event(event: dict) -> None:
+    if not METRICS_FILE:
+        return
+    try:
+        with open(METRICS_FILE, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps({"ts": round(time.time(), 3), **event}, default=str) + "\n")
+    except OSError:
+        pass
+
+
+@contextlib.contextmanager
+def timed(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        METRICS.observe(f"{name}.ms", (time.perf_counter() - started) * 1000)
+
+
+def event_args(kwargs: dict) -> dict:
+    args = {}
+    for key, value in kwargs.items():
+        if key == "ctx":
+            continue
+        if isinstance(value, str) and len(value) > METRICS_ARG_CHARS:
+            # Diff bodies and commit messages would bloat the log and copy source text into it.
+            value = {"omitted_chars": len(value)}
+        args[key] = value
+    return args
+
+
+def instrumented(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = await func(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            METRICS.observe(f"tool.{func.__name__}.ms", elapsed_ms)
+            if not ok:
+                METRICS.increment(f"tool.{func.__name__}.errors")
+            record_event(
+                {
+                    "event": "tool",
+                    "tool": func.__name__,
+                    "args": event_args(kwargs),
+                    "ok": ok,
+                    "duration_ms": round(elapsed_ms, 1),
+                }
+            )
+
+    return wrapper
+
+
+PRUNE_DIRS = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".svn",
+        ".venv",
+        "venv",
+        "node_modules",
+        ".next",
+        ".nuxt",
+        ".turbo",
+        "dist",
+        "build",
+        "out",
+        "coverage",
+        "__pycache__",
+        ".pytest_cache",
+        ".mypy_cache",
+        ".ruff_cache",
+        ".tox",
+        ".nox",
+    }
+)
+PYTHON_MARKERS = ("pyproject.toml", "setup.py", "setup.cfg", "pytest.ini", "requirements.txt", "requirements-dev.txt")
+JS_MARKERS = ("package.json", "tsconfig.json")
+LOCKFILES = ("pnpm-lock.yaml", "yarn.lock", "package-lock.json", "poetry.lock", "uv.lock", "Pipfile.lock")
+PROFILE_INPUTS = (*PYTHON_MARKERS, *JS_MARKERS, *LOCKFILES, ".gitignore")
+LANGUAGE_SUFFIXES = {
+    ".py": "python",
+    ".ts": "typescript",
+    ".tsx": "typescript",
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".mjs": "javascript",
+    ".cjs": "javascript",
+}
+JS_TEST_RUNNERS = ("vitest", "jest", "mocha", "playwright")
+JS_SOURCE_SUFFIXES = (".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs", ".mts", ".cts")
+JS_RESOLVE_SUFFIXES = ("", *JS_SOURCE_SUFFIXES, *(f"/index{suffix}" for suffix in JS_SOURCE_SUFFIXES))
+JS_CONFIG_FILES = ("vitest.config.*", "vite.config.*", "jest.config.*", "vitest.workspace.*", "babel.config.*", ".babelrc")
+FULL_SUITE_TRIGGERS = (
+    *JS_MARKERS,
+    *JS_CONFIG_FILES,
+    *LOCKFILES,
+    "pyproject.toml",
+    "setup.py",
+    "setup.cfg",
+    "pytest.ini",
+    "tox.ini",
+    "conftest.py",
+    "requirements*.txt",
+)
+JS_TEST_FILE_RE = re.compile(r"\.(test|spec)\.[cm]?[jt]sx?$")
+JS_IMPORT_RE = re.compile(
+    r"""(?:\bimport\s+(?:[\w*{}\s,$]+?\s+from\s+)?|\bexport\s+[\w*{}\s,$]+?\s+from\s+|\brequire\(\s*|\bimport\(\s*)["']([^"'\n]+)["']"""
+)
+PY_IMPORT_RE = re.compile(r"^[ \t]*(?:from[ \t]+(\.*[\w.]*)[ \t]+import[ \t]+(\([^)]*\)|[^\n#]+)|import[ \t]+([^\n#]+))", re.M)
+VITEST_ALIAS_RE = re.compile(r"""["']?([\w@~$#/.-]+)["']?\s*:\s*path\.resolve\(\s*__dirname\s*,\s*["']([^"']+)["']\s*\)""")
+VITEST_SETUP_RE = re.compile(r"setupFiles\s*:\s*\[([^\]]*)\]")
+
+_PROFILE_CACHE: dict[Path, tuple[tuple, dict]] = {}
+
+
+def parse_gitignore(path: Path, base: str) -> list[tuple[str, str, bool, bool, bool]]:
+    try:
+        lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
+    except OSError:
+        return []
+    rules = []
+    for raw in lines:
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.strip("/") if dir_only else line
+        anchored = "/" in line.rstrip("/")
+        line = line.lstrip("/")
+        if line:
+            rules.append((base, line, negate, dir_only, anchored))
+    return rules
+
+
+def is_ignored(rel_path: str, is_dir: bool, rules: list[tuple[str, str, bool, bool, bool]]) -> bool:
+    ignored = False
+    for base, pattern, negate, dir_only, anchored in rules:
+        if dir_only and not is_dir:
+            continue
+        if base:
+            if not rel_path.startswith(base + "/"):
+                continue
+            candidate = rel_path[len(base) + 1 :]
+        else:
+            candidate = rel_path
+        if anchored:
+            matched = fnmatch.fnmatchcase(candidate, pattern)
+        else:
+            matched = fnmatch.fnmatchcase(candidate.rsplit("/", 1)[-1], pattern)
+        if matched:
+            ignored = not negate
+    return ignored
+
+
+def iter_project_files(
+    root: Path, limit: int = MAX_PROFILE_ENTRIES, on_truncated: Optional[Callable[[], None]] = None
+):
+    rules = parse_gitignore(root / ".gitignore", "")
+    stack = [(root, "")]
+    seen = 0
+    while stack:
+        directory, rel_dir = stack.pop()
+        if rel_dir and (directory / ".gitignore").is_file():
+            rules = [*rules, *parse_gitignore(directory / ".gitignore", rel_dir)]
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            seen += 1
+            if seen > limit:
+                if on_truncated is not None:
+                    on_truncated()
+                return
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                if entry.name in PRUNE_DIRS or is_ignored(rel_path, True, rules):
+                    continue
+                stack.append((Path(entry.path), rel_path))
+            elif not is_ignored(rel_path, False, rules):
+                yield rel_path
+
+
+def profile_fingerprint(root: Path) -> tuple:
+    stamps = []
+    for name in PROFILE_INPUTS:
+        try:
+            stamps.append(os.stat(root / name).st_mtime_ns)
+        except OSError:
+            stamps.append(None)
+    return tuple(stamps)
+
+
+def read_package_json(root: Path) -> dict:
+    try:
+        return json.loads((root / "package.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def detect_js_test_runner(package: dict) -> Optional[str]:
+    script = str(package.get("scripts", {}).get("test", ""))
+    for runner in JS_TEST_RUNNERS:
+        if runner in script:
+            return runner
+    dependencies = {**package.get("dependencies", {}), **package.get("devDependencies", {})}
+    for runner in JS_TEST_RUNNERS:
+        if runner in dependencies:
+            return runner
+    return None
 
 
-def trim_output(output: str) -> str:
-    if len(output) > MAX_LOG_CHARS:
-        return output[-MAX_LOG_CHARS:]
-    return output
+def build_project_profile(root: Path) -> dict:
+    markers = [name for name in PROFILE_INPUTS if (root / name).is_file()]
+    languages: dict[str, int] = {}
+    source_roots: set[str] = set()
+    scanned = 0
+    for rel_path in iter_project_files(root):
+        scanned += 1
+        language = LANGUAGE_SUFFIXES.get(os.path.splitext(rel_path)[1])
+        if language is None:
+            continue
+        languages[language] = languages.get(language, 0) + 1
+        source_roots.add(rel_path.split("/", 1)[0] if "/" in rel_path else ".")
+    if "tsconfig.json" in markers:
+        languages.setdefault("typescript", 0)
+    if any(marker in markers for marker in PYTHON_MARKERS):
+        languages.setdefault("python", 0)
+
+    package_manager = None
+    test_runner = None
+    if "package.json" in markers:
+        if "pnpm-lock.yaml" in markers:
+            package_manager = "pnpm"
+        elif "yarn.lock" in markers:
+            package_manager = "yarn"
+        else:
+            package_manager = "npm"
+        test_runner = detect_js_test_runner(read_package_json(root))
+    elif "python" in languages:
+        test_runner = "pytest"
+
+    return {
+        "root": str(root),
+        "markers": markers,
+        "languages": dict(sorted(languages.items())),
+        "package_manager": package_manager,
+        "test_runner": test_runner,
+        "source_roots": sorted(source_roots),
+        "files_scanned": scanned,
+    }
+
+
+def get_project_profile(root: Path, refresh: bool = False) -> dict:
+    with timed("phase.detect"):
+        fingerprint = profile_fingerprint(root)
+        cached = _PROFILE_CACHE.get(root)
+        if cached and cached[0] == fingerprint and not refresh:
+            return cached[1]
+        with timed("phase.detect.build"):
+            profile = build_project_profile(root)
+        _PROFILE_CACHE[root] = (fingerprint, profile)
+        return profile
 
 
 def detect_package_manager() -> str:
-    if (ROOT / "pnpm-lock.yaml").exists():
-        return "pnpm"
-    if (ROOT / "yarn.lock").exists():
-        return "yarn"
-    return "npm"
+    return current_project().profile["package_manager"] or "npm"
 
 
 def is_python_project() -> bool:
-    markers = ["pyproject.toml", "pytest.ini", "requirements.txt", "requirements-dev.txt"]
-    if any((ROOT / marker).exists() for marker in markers):
-        return True
-    return any(ROOT.rglob("*.py"))
+    return "python" in current_project().profile["languages"]
 
 
 def is_typescript_project() -> bool:
-    if (ROOT / "tsconfig.json").exists():
-        return True
-    for directory in ("app", "src", "lib", "tests"):
-        path = ROOT / directory
-        if path.exists() and (any(path.rglob("*.ts")) or any(path.rglob("*.tsx"))):
-            return True
-    return False
+    return "typescript" in current_project().profile["languages"]
 
 
 def is_javascript_project() -> bool:
-    return (ROOT / "package.json").exists()
+    return "package.json" in current_project().profile["markers"]
+
+
+class ProjectContext:
+    def __init__(self, root: Path):
+        self.root = root
+        self.lock = asyncio.Lock()
+        self.import_graph = ImportGraph(root)
+        self.patched_files: set[str] = set()
+        self.patched_at = 0.0
+
+    @property
+    def profile(self) -> dict:
+        return get_project_profile(self.root)
+
+
+_PROJECTS: dict[Path, ProjectContext] = {}
+_CURRENT_PROJECT: ContextVar[Optional[ProjectContext]] = ContextVar("testops_project", default=None)
+
+
+def resolve_project_root(project: Optional[str]) -> Path:
+    if not project:
+        if REQUIRE_PROJECT:
+            # A shared server must never fall back to its own default root for writes such as git_commit.
+            raise ValueError("project is required: pass the project root to every TestOps tool call")
+        return ROOT
+    candidate = Path(project).expanduser()
+    if not candidate.is_absolute():
+        candidate = DEFAULT_ROOT / candidate
+    candidate = candidate.resolve()
+    if not candidate.is_dir():
+        raise ValueError(f"Project root does not exist: {project}")
+    return candidate
+
+
+def get_project(project: Optional[str] = None) -> ProjectContext:
+    root = resolve_project_root(project)
+    context = _PROJECTS.get(root)
+    if context is None:
+        context = _PROJECTS[root] = ProjectContext(root)
+    return context
+
 
+def current_project() -> ProjectContext:
+    return _CURRENT_PROJECT.get() or get_project()
 
-async def run_command(cmd: list[str], timeout: int) -> dict:
+
+def project_root() -> Path:
+    return current_project().root
+
+
+@contextlib.contextmanager
+def use_project(context: ProjectContext):
+    token = _CURRENT_PROJECT.set(context)
+    try:
+        yield context
+    finally:
+        _CURRENT_PROJECT.reset(token)
+
+
+@contextlib.asynccontextmanager
+async def project_session(project: Optional[str]):
+    context = get_project(project)
+    async with context.lock:
+        with use_project(context):
+            yield context
+
+
+OutputCallback = Callable[[str, bytes], Awaitable[None]]
+ProgressReporter = Callable[[Optional[str]], Optional[OutputCallback]]
+
+_RUN_LOGS: "OrderedDict[str, Path]" = OrderedDict()
+
+
+def resolve_executable(cmd: list[str]) -> list[str]:
     if os.name == "nt":
         executable = shutil.which(cmd[0]) or shutil.which(f"{cmd[0]}.cmd") or shutil.which(f"{cmd[0]}.exe")
         if executable:
             if executable.lower().endswith(".cmd"):
                 cmd_exe = shutil.which("cmd.exe") or "cmd.exe"
-                cmd = [cmd_exe, "/c", executable, *cmd[1:]]
+                return [cmd_exe, "/c", executable, *cmd[1:]]
+            return [executable, *cmd[1:]]
+    return cmd
+
+
+def register_run_log(run_id: str) -> Path:
+    SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    path = SPOOL_DIR / f"{run_id}.log"
+    _RUN_LOGS[run_id] = path
+    while len(_RUN_LOGS) > MAX_SPOOLED_RUNS:
+        _, stale = _RUN_LOGS.popitem(last=False)
+        stale.unlink(missing_ok=True)
+    return path
+
+
+def spool_owner_alive(path: Path) -> bool:
+    if not path.name.isdigit():
+        return False
+    if os.name == "nt":
+        # Signal 0 is CTRL_C_EVENT on Windows, so rely on the age cutoff there.
+        return True
+    try:
+        os.kill(int(path.name), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def purge_stale_spools() -> None:
+    # Spools of servers that crashed or were killed are never cleaned up by their own lifespan.
+    if not SPOOL_ROOT.is_dir():
+        return
+    cutoff = time.time() - SPOOL_MAX_AGE_SEC
+    for entry in SPOOL_ROOT.iterdir():
+        if entry == SPOOL_DIR:
+            continue
+        try:
+            if entry.is_dir():
+                if not spool_owner_alive(entry) or entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry, ignore_errors=True)
             else:
-                cmd = [executable, *cmd[1:]]
-    process = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-        cwd=str(ROOT),
-    )
+                entry.unlink(missing_ok=True)
+        except OSError:
+            continue
+
+
+def kill_process(process: asyncio.subprocess.Process) -> None:
     try:
-        stdout_bytes, stderr_bytes = await asyncio.wait_for(process.communicate(), timeout=timeout)
-    except asyncio.TimeoutError as exc:
-        process.kill()
-        stdout_bytes, stderr_bytes = await process.communicate()
-        raise RuntimeError(f"Command timed out: {' '.join(cmd)}") from exc
+        if os.name == "nt":
+            if process.returncode is None:
+                process.kill()
+        else:
+            # Kill the whole session even after the leader exited: background grandchildren may still hold the pipes.
+            os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def wait_for_exit(process: asyncio.subprocess.Process) -> int:
+    # Process.wait() only returns once the pipes are closed as well, which a grandchild can delay indefinitely.
+    while process.returncode is None:
+        await asyncio.sleep(EXIT_POLL_SEC)
+    return process.returncode
+
+
+def progress_reporter(ctx: Optional[Context]) -> ProgressReporter:
+    # One counter per request: parallel checks and shards share the progress token, which must strictly increase.
+    received = 0
+    lock = asyncio.Lock()
+
+    def labelled(label: Optional[str]) -> Optional[OutputCallback]:
+        if ctx is None:
+            return None
+        context = ctx
+
+        async def report(stream: str, chunk: bytes) -> None:
+            nonlocal received
+            lines = chunk.decode("utf-8", errors="replace").strip().splitlines()
+            message = f"[{label}:{stream}]" if label else f"[{stream}]"
+            if lines:
+                message = f"{message} {lines[-1][:PROGRESS_MESSAGE_CHARS]}"
+            async with lock:
+                received += len(chunk)
+                await context.report_progress(received, message=message)
+
+        return report
+
+    return labelled
+
+
+async def pump_stream(
+    stream: asyncio.StreamReader,
+    name: str,
+    tail: bytearray,
+    spool,
+    on_output: Optional[OutputCallback],
+) -> None:
+    while True:
+        chunk = await stream.read(READ_CHUNK_BYTES)
+        if not chunk:
+            return
+        spool.write(chunk)
+        tail.extend(chunk)
+        if len(tail) > TAIL_BYTES:
+            del tail[: len(tail) - TAIL_BYTES]
+        if on_output is not None:
+            try:
+                await on_output(name, chunk)
+            except Exception:
+                # A broken progress channel must not stop the pipe from draining.
+                on_output = None
+
+
+async def sample_peak_rss(pid: int, usage: dict) -> None:
+    while True:
+        rss = process_tree_rss(pid)
+        if rss is None:
+            return
+        usage["peak_rss_bytes"] = max(usage["peak_rss_bytes"], rss)
+        await asyncio.sleep(RSS_SAMPLE_SEC)
+
+
+def record_process_metrics(
+    cmd: list[str],
+    returncode: Optional[int],
+    spawn_sec: float,
+    run_started: float,
+    output_bytes: int,
+    usage: dict,
+) -> None:
+    runtime_sec = time.perf_counter() - run_started
+    METRICS.observe("process.spawn.ms", spawn_sec * 1000)
+    METRICS.observe("process.runtime.ms", runtime_sec * 1000)
+    METRICS.observe("process.output_bytes", output_bytes, SIZE_BUCKETS_BYTES)
+    if usage["peak_rss_bytes"]:
+        METRICS.observe("process.peak_rss_bytes", usage["peak_rss_bytes"], SIZE_BUCKETS_BYTES)
+    record_event(
+        {
+            "event": "process",
+            "command": cmd,
+            "returncode": returncode,
+            "spawn_ms": round(spawn_sec * 1000, 1),
+            "runtime_ms": round(runtime_sec * 1000, 1),
+            "output_bytes": output_bytes,
+            **usage,
+        }
+    )
+
 
-    stdout = stdout_bytes.decode("utf-8", errors="replace")
-    stderr = stderr_bytes.decode("utf-8", errors="replace")
+async def run_command(cmd: list[str], timeout: int, on_output: Optional[OutputCallback] = None) -> dict:
+    cmd = resolve_executable(cmd)
+    run_id = uuid.uuid4().hex[:12]
+    log_path = register_run_log(run_id)
+    stdout_tail = bytearray()
+    stderr_tail = bytearray()
+    timed_out = False
+    usage = {"peak_rss_bytes": 0}
+    with log_path.open("wb") as spool:
+        spawn_started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=str(project_root()),
+            start_new_session=os.name != "nt",
+        )
+        run_started = time.perf_counter()
+        if process.stdout is None or process.stderr is None:
+            raise RuntimeError(f"Pipes were not opened for {cmd[0]}")
+        sampler = asyncio.create_task(sample_peak_rss(process.pid, usage))
+        pumps = asyncio.gather(
+            pump_stream(process.stdout, "stdout", stdout_tail, spool, on_output),
+            pump_stream(process.stderr, "stderr", stderr_tail, spool, on_output),
+        )
+        try:
+            await asyncio.wait_for(wait_for_exit(process), timeout=timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+            kill_process(process)
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(wait_for_exit(process), timeout=KILL_GRACE_SEC)
+        except asyncio.CancelledError:
+            kill_process(process)
+            sampler.cancel()
+            # Reap the killed session so its transport closes while the loop is still running.
+            with contextlib.suppress(asyncio.TimeoutError, asyncio.CancelledError):
+                await asyncio.wait_for(asyncio.gather(wait_for_exit(process), pumps), timeout=KILL_GRACE_SEC)
+            raise
+        finally:
+            sampler.cancel()
+        try:
+            await asyncio.wait_for(asyncio.shield(pumps), timeout=KILL_GRACE_SEC)
+        except asyncio.TimeoutError:
+            # The leader exited but something in its session still holds the pipes open.
+            kill_process(process)
+            try:
+                await asyncio.wait_for(pumps, timeout=KILL_GRACE_SEC)
+            except asyncio.TimeoutError:
+                pass
+
+    log_bytes = log_path.stat().st_size
+    record_process_metrics(cmd, process.returncode, run_started - spawn_started, run_started, log_bytes, usage)
     result = {
         "command": cmd,
         "returncode": process.returncode,
-        "stdout": trim_output(stdout),
-        "stderr": trim_output(stderr),
+        "run_id": run_id,
+        "log_bytes": log_bytes,
+        "stdout": stdout_tail.decode("utf-8", errors="replace"),
+        "stderr": stderr_tail.decode("utf-8", errors="replace"),
     }
+    if timed_out:
+        result["timed_out"] = True
+        raise RuntimeError(json.dumps(result))
     if process.returncode != 0:
         raise RuntimeError(json.dumps(result))
     return result
 
 
-def build_js_command(base: list[str], pattern: Optional[str]) -> list[str]:
+def failure_payload(exc: Exception) -> dict:
+    try:
+        payload = json.loads(str(exc))
+    except ValueError:
+        payload = None
+    if isinstance(payload, dict):
+        return payload
+    return {"error": str(exc)}
+
+
+async def run_git(args: list[str], env: Optional[dict] = None) -> Optional[str]:
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *resolve_executable(["git", *args]),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            cwd=str(project_root()),
+            env=env,
+        )
+    except OSError:
+        return None
+    stdout, _ = await process.communicate()
+    if process.returncode != 0:
+        return None
+    return stdout.decode("utf-8", errors="replace").strip()
+
+
+async def working_tree_hash() -> Optional[str]:
+    with timed("phase.tree_hash"):
+        return await compute_working_tree_hash()
+
+
+async def compute_working_tree_hash() -> Optional[str]:
+    index = await run_git(["rev-parse", "--git-path", "index"])
+    if index is None:
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        # Start from a copy of the real index so git can reuse its stat cache. Keep its mtime: git only rehashes
+        # entries modified in the same second as the index ("racily clean") when it can compare against it.
+        temp_index = Path(tmp) / "index"
+        real_index = project_root() / index
+        if real_index.exists():
+            shutil.copy2(real_index, temp_index)
+        env = {**os.environ, "GIT_INDEX_FILE": str(temp_index)}
+        if await run_git(["add", "-A", "--", "."], env) is None:
+            return None
+        return await run_git(["write-tree"], env)
+
+
+def tool_fingerprint(command: list[str]) -> list:
+    executable = shutil.which(command[0])
+    if executable is None:
+        return [command[0]]
+    stat = os.stat(executable)
+    return [executable, stat.st_mtime_ns, stat.st_size]
+
+
+def check_cache_key(tree: str, command: list[str]) -> str:
+    material = {
+        "version": CACHE_VERSION,
+        "root": str(project_root()),
+        "tree": tree,
+        "command": command,
+        "tool": tool_fingerprint(command),
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_cached_result(key: str) -> Optional[dict]:
+    path = CACHE_DIR / f"{key}.json"
+    try:
+        if time.time() - path.stat().st_mtime > CACHE_MAX_AGE_SEC:
+            path.unlink(missing_ok=True)
+            return None
+        entry = json.loads(path.read_text(encoding="utf-8"))
+        os.utime(path)
+    except (OSError, ValueError):
+        return None
+    return entry
+
+
+def evict_cached_results() -> None:
+    entries = []
+    now = time.time()
+    for path in CACHE_DIR.glob("*.json"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        if now - stat.st_mtime > CACHE_MAX_AGE_SEC:
+            path.unlink(missing_ok=True)
+        else:
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= CACHE_MAX_BYTES:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+
+
+def store_cached_result(key: str, result: dict, failed: bool) -> None:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = CACHE_DIR / f"{key}.json"
+    temp_path = path.with_suffix(f".{uuid.uuid4().hex[:8]}.tmp")
+    temp_path.write_text(json.dumps({"failed": failed, "result": result}), encoding="utf-8")
+    os.replace(temp_path, path)
+    evict_cached_results()
+
+
+def cached_response(entry: dict) -> dict:
+    result = {**entry["result"], "cached": True}
+    log_path = _RUN_LOGS.get(result.get("run_id") or "")
+    if log_path is None or not log_path.exists():
+        # Spooled logs do not outlive the server process, so a stale run_id would only fail in read_log.
+        result.pop("run_id", None)
+        result["log"] = "unavailable for this cached result; rerun with force=true to capture the full output"
+    return result
+
+
+async def run_cached(
+    command: list[str],
+    timeout: int,
+    tree: Optional[str],
+    force: bool = False,
+    on_output: Optional[OutputCallback] = None,
+    runner: Optional[Callable[..., Awaitable[dict]]] = None,
+) -> dict:
+    key = check_cache_key(tree, command) if tree else None
+    if key and not force:
+        entry = load_cached_result(key)
+        METRICS.increment("cache.hits" if entry is not None else "cache.misses")
+        if entry is not None:
+            result = cached_response(entry)
+            if entry["failed"]:
+                raise RuntimeError(json.dumps(result))
+            return result
+    try:
+        result = await (runner or run_command)(command, timeout, on_output)
+    except RuntimeError as exc:
+        payload = failure_payload(exc)
+        if "returncode" not in payload:
+            raise
+        payload["cached"] = False
+        if key and not payload.get("timed_out"):
+            store_cached_result(key, payload, failed=True)
+        raise RuntimeError(json.dumps(payload)) from exc
+    result["cached"] = False
+    if key:
+        store_cached_result(key, result, failed=False)
+    return result
+
+
+class ImportGraph:
+    def __init__(self, root: Path):
+        self.root = root
+        self.entries: dict[str, tuple[int, tuple[str, ...]]] = {}
+        self.files: set[str] = set()
+        self.truncated = False
+
+    def refresh(self) -> None:
+        truncated = []
+        files = set(iter_project_files(self.root, MAX_PROFILE_ENTRIES, lambda: truncated.append(True)))
+        for rel_path in list(self.entries):
+            if rel_path not in files:
+                del self.entries[rel_path]
+        for rel_path in files:
+            is_js = rel_path.endswith(JS_SOURCE_SUFFIXES)
+            if not is_js and not rel_path.endswith(".py"):
+                continue
+            try:
+                mtime = os.stat(self.root / rel_path).st_mtime_ns
+            except OSError:
+                continue
+            cached = self.entries.get(rel_path)
+            if cached and cached[0] == mtime:
+                continue
+            try:
+                source = (self.root / rel_path).read_text(encoding="utf-8", errors="replace")
+            except OSError:
+                continue
+            specifiers = parse_js_imports(source) if is_js else parse_python_imports(rel_path, source)
+            self.entries[rel_path] = (mtime, specifiers)
+        self.files = files
+        self.truncated = bool(truncated)
+
+    def dependents(self, changed: set[str]) -> set[str]:
+        files = self.files | changed
+        aliases = load_js_aliases(self.root)
+        modules = python_module_index(files)
+        reverse: dict[str, set[str]] = {}
+        for rel_path, (_, specifiers) in self.entries.items():
+            for specifier in specifiers:
+                if rel_path.endswith(".py"):
+                    target = modules.get(specifier)
+                else:
+                    target = resolve_js_import(rel_path, specifier, files, aliases)
+                if target and target != rel_path:
+                    reverse.setdefault(target, set()).add(rel_path)
+        reached = set(changed)
+        queue = list(changed)
+        while queue:
+            for importer in reverse.get(queue.pop(), ()):
+                if importer not in reached:
+                    reached.add(importer)
+                    queue.append(importer)
+        return reached
+
+
+def parse_js_imports(source: str) -> tuple[str, ...]:
+    return tuple(dict.fromkeys(match.group(1) for match in JS_IMPORT_RE.finditer(source)))
+
+
+def parse_python_imports(rel_path: str, source: str) -> tuple[str, ...]:
+    package = rel_path[: -len(".py")].split("/")[:-1]
+    modules = []
+    for match in PY_IMPORT_RE.finditer(source):
+        base, names, plain = match.groups()
+        if plain is not None:
+            modules.extend(name.split(" as ")[0].strip() for name in plain.split(","))
+            continue
+        level = len(base) - len(base.lstrip("."))
+        base = base.lstrip(".")
+        if level:
+            anchor = package[: len(package) - level + 1] if level <= len(package) + 1 else []
+            base = ".".join([*anchor, base] if base else anchor)
+        if base:
+            modules.append(base)
+        for name in names.strip("()").split(","):
+            name = name.split(" as ")[0].strip()
+            if name and name != "*":
+                modules.append(f"{base}.{name}" if base else name)
+    return tuple(dict.fromkeys(module for module in modules if module))
+
+
+def python_module_index(files: set[str]) -> dict[str, str]:
+    modules = {}
+    for rel_path in files:
+        if not rel_path.endswith(".py"):
+            continue
+        parts = rel_path[: -len(".py")].split("/")
+        if parts[-1] == "__init__":
+            parts = parts[:-1]
+        if not parts:
+            continue
+        modules.setdefault(".".join(parts), rel_path)
+        if parts[0] == "src" and len(parts) > 1:
+            modules.setdefault(".".join(parts[1:]), rel_path)
+    return modules
+
+
+def load_js_aliases(root: Path) -> dict[str, str]:
+    aliases = {}
+    try:
+        compiler_options = json.loads((root / "tsconfig.json").read_text(encoding="utf-8")).get("compilerOptions", {})
+    except (OSError, ValueError):
+        compiler_options = {}
+    base_url = compiler_options.get("baseUrl", ".")
+    for key, targets in compiler_options.get("paths", {}).items():
+        if targets:
+            prefix = key[:-2] if key.endswith("/*") else key
+            target = targets[0][:-2] if targets[0].endswith("/*") else targets[0]
+            aliases[prefix] = posixpath.normpath(posixpath.join(base_url, target))
+    for pattern in JS_CONFIG_FILES[:2]:
+        for config in root.glob(pattern):
+            try:
+                text = config.read_text(encoding="utf-8")
+            except OSError:
+                continue
+            for prefix, target in VITEST_ALIAS_RE.findall(text):
+                aliases[prefix] = posixpath.normpath(target)
+    return aliases
+
+
+def resolve_js_import(importer: str, specifier: str, files: set[str], aliases: dict[str, str]) -> Optional[str]:
+    if specifier.startswith("."):
+        base = posixpath.normpath(posixpath.join(posixpath.dirname(importer), specifier))
+    else:
+        for prefix in sorted(aliases, key=len, reverse=True):
+            if specifier == prefix or specifier.startswith(prefix.rstrip("/") + "/"):
+                rest = specifier[len(prefix) :].lstrip("/")
+                base = posixpath.normpath(posixpath.join(aliases[prefix], rest))
+                break
+        else:
+            return None
+    candidates = [base]
+    if base.endswith((".js", ".jsx", ".mjs", ".cjs")):
+        candidates.append(base.rsplit(".", 1)[0])
+    for candidate in candidates:
+        for suffix in JS_RESOLVE_SUFFIXES:
+            if f"{candidate}{suffix}" in files:
+                return f"{candidate}{suffix}"
+    return None
+
+
+def is_test_file(rel_path: str, javascript: bool) -> bool:
+    if javascript:
+        return bool(JS_TEST_FILE_RE.search(rel_path))
+    name = rel_path.rsplit("/", 1)[-1]
+    return name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py"))
+
+
+def vitest_setup_files(root: Path) -> set[str]:
+    setup_files = set()
+    for config in root.glob(JS_CONFIG_FILES[0]):
+        try:
+            match = VITEST_SETUP_RE.search(config.read_text(encoding="utf-8"))
+        except OSError:
+            continue
+        if match:
+            for item in re.findall(r"""["']([^"']+)["']""", match.group(1)):
+                setup_files.add(posixpath.normpath(item))
+    return setup_files
+
+
+def diff_paths(unified_diff: str) -> set[str]:
+    paths = set()
+    for line in unified_diff.splitlines():
+        if line.startswith(("+++ ", "--- ")):
+            path = line[4:].split("\t", 1)[0].strip()
+            if path != "/dev/null":
+                paths.add(path[2:] if path.startswith(("a/", "b/")) else path)
+    return paths
+
+
+async def project_relative_paths(paths: Iterable[str]) -> set[str]:
+    # Diff headers are relative to the git top level, while the import graph is keyed by project-relative paths.
+    prefix = await run_git(["rev-parse", "--show-prefix"]) or ""
+    return {path[len(prefix) :] for path in paths if path.startswith(prefix)}
+
+
+async def changed_files() -> Optional[set[str]]:
+    tracked = await run_git(["diff", "--name-only", "--relative", "HEAD"])
+    untracked = await run_git(["ls-files", "--others", "--exclude-standard"])
+    patched = current_project().patched_files
+    if tracked is None or untracked is None:
+        return set(patched) if patched else None
+    return {line for line in (*tracked.splitlines(), *untracked.splitlines()) if line} | patched
+
+
+async def newest_edit_since(old_tree: str, new_tree: str) -> Optional[float]:
+    names = await run_git(["diff-tree", "-r", "--name-only", old_tree, new_tree])
+    if names is None:
+        return None
+    context = current_project()
+    newest = context.patched_at
+    for path in await project_relative_paths(names.splitlines()):
+        try:
+            newest = max(newest, os.stat(project_root() / path).st_mtime)
+        except OSError:
+            # A deletion leaves no mtime behind; only apply_patch tells us when it happened.
+            if path not in context.patched_files:
+                return None
+    return newest
+
+
+async def select_affected_tests() -> dict:
+    started = time.perf_counter()
+    javascript = is_javascript_project()
+    changed = await changed_files()
+    selection: dict = {"changed": sorted(changed or ()), "tests": [], "fallback": None}
+    triggers = vitest_setup_files(project_root()) if javascript else set()
+    if changed is None:
+        selection["fallback"] = "no change information available"
+    else:
+        for path in sorted(changed):
+            name = path.rsplit("/", 1)[-1]
+            if path in triggers or any(fnmatch.fnmatchcase(name, pattern) for pattern in FULL_SUITE_TRIGGERS):
+                selection["fallback"] = f"{path} affects the whole suite"
+                break
+            # Fixtures, snapshots, templates and other data files are read at runtime, not imported.
+            if not path.endswith((".py", *JS_SOURCE_SUFFIXES)):
+                selection["fallback"] = f"{path} is not tracked by the import graph"
+                break
+    if selection["fallback"] is None and changed:
+        graph = current_project().import_graph
+        with timed("phase.import_graph"):
+            graph.refresh()
+            affected = graph.dependents(changed)
+        if graph.truncated:
+            selection["fallback"] = f"project has more than {MAX_PROFILE_ENTRIES} entries; the import graph is partial"
+        else:
+            selection["tests"] = sorted(
+                path for path in affected if is_test_file(path, javascript) and (project_root() / path).is_file()
+            )
+    selection["selection_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    METRICS.observe("phase.select.ms", selection["selection_ms"])
+    return selection
+
+
+def process_tree_rss(pid: int) -> Optional[int]:
+    proc = Path("/proc")
+    if not proc.is_dir():
+        return None
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            for line in (proc / str(current) / "status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1]) * 1024
+                    break
+            for task in (proc / str(current) / "task").iterdir():
+                pending.extend(int(child) for child in (task / "children").read_text().split())
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+class WarmWorker:
+    def __init__(self, name: str, command: list[str], cwd: Path, start_re: str, end_re: str):
+        self.name = name
+        self.command = command
+        self.cwd = cwd
+        self.start_re = re.compile(start_re)
+        self.end_re = re.compile(end_re)
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.reader: Optional[asyncio.Task] = None
+        self.cycle: list[str] = []
+        self.cycle_bytes = 0
+        self.last_output = ""
+        self.last_passed = False
+        self.generation = 0
+        self.cycle_starts = 0
+        self.completed_start = 0
+        self.cycle_started_at = 0.0
+        self.completed_started_at = 0.0
+        self.accepted: Optional[tuple[str, int]] = None
+        self.busy = False
+        self.restarts = 0
+        self.stopping = False
+        self.started_at = 0.0
+        self.last_used = time.monotonic()
+        self.on_output: Optional[OutputCallback] = None
+        self.changed = asyncio.Condition()
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self) -> None:
+        self.stopping = False
+        self.generation = 0
+        self.busy = True
+        self.cycle = []
+        self.cycle_bytes = 0
+        self.process = await asyncio.create_subprocess_exec(
+            *resolve_executable(self.command),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            stdin=asyncio.subprocess.DEVNULL,
+            cwd=str(self.cwd),
+            limit=WORKER_LINE_LIMIT,
+            start_new_session=os.name != "nt",
+        )
+        self.started_at = time.monotonic()
+        self.cycle_started_at = time.time()
+        self.reader = asyncio.create_task(self.read_loop(self.process))
+
+    async def stop(self) -> None:
+        self.stopping = True
+        if self.process is not None:
+            kill_process(self.process)
+            await self.process.wait()
+        if self.reader is not None:
+            self.reader.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.reader
+        self.process = None
+        self.reader = None
+        async with self.changed:
+            self.changed.notify_all()
+
+    async def restart(self) -> None:
+        self.restarts += 1
+        await self.stop()
+        await self.start()
+
+    async def read_loop(self, process: asyncio.subprocess.Process) -> None:
+        if process.stdout is None:
+            return
+        while True:
+            try:
+                raw = await process.stdout.readline()
+            except ValueError:
+                raw = await process.stdout.read(WORKER_LINE_LIMIT)
+            if not raw:
+                break
+            line = raw.decode("utf-8", errors="replace")
+            if self.start_re.search(line):
+                self.busy = True
+                self.cycle = []
+                self.cycle_bytes = 0
+                self.cycle_starts += 1
+                self.cycle_started_at = time.time()
+                async with self.changed:
+                    self.changed.notify_all()
+            self.cycle.append(line)
+            self.cycle_bytes += len(raw)
+            while self.cycle_bytes > TAIL_BYTES * 4 and len(self.cycle) > 1:
+                self.cycle_bytes -= len(self.cycle.pop(0).encode("utf-8"))
+            if self.on_output is not None:
+                with contextlib.suppress(Exception):
+                    await self.on_output(self.name, raw)
+            match = self.end_re.search(line)
+            if match:
+                self.last_output = "".join(self.cycle)
+                self.last_passed = self.cycle_passed(match, self.last_output)
+                self.cycle = []
+                self.cycle_bytes = 0
+                self.busy = False
+                self.generation += 1
+                self.completed_start = self.cycle_starts
+                self.completed_started_at = self.cycle_started_at
+                async with self.changed:
+                    self.changed.notify_all()
+        async with self.changed:
+            self.changed.notify_all()
+
+    def cycle_passed(self, match: re.Match, output: str) -> bool:
+        return match.group(1) == "0"
+
+    async def wait_until(self, predicate: Callable[[], bool], deadline: float) -> bool:
+        async with self.changed:
+            while not predicate():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.running:
+                    return predicate()
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self.changed.wait(), timeout=remaining)
+        return True
+
+    def is_current(self, tree: Optional[str]) -> bool:
+        return (
+            tree is not None
+            and self.running
+            and not self.busy
+            and self.accepted == (tree, self.generation)
+            and self.completed_start == self.cycle_starts
+        )
+
+    async def run(
+        self,
+        command: list[str],
+        timeout: int,
+        on_output: Optional[OutputCallback] = None,
+        tree: Optional[str] = None,
+    ) -> Optional[dict]:
+        self.last_used = time.monotonic()
+        deadline = time.monotonic() + timeout
+        current = self.is_current(tree)
+        edited_at: Optional[float] = None
+        if self.running and not current and tree is not None and self.accepted is not None:
+            # The watcher usually rebuilds while the agent is thinking, so a cycle that began after the newest edit
+            # since the last accepted tree already covers the caller's changes.
+            edited_at = await newest_edit_since(self.accepted[0], tree)
+        if edited_at is None:
+            edited_at = time.time()
+        settle = deadline
+        if not self.running:
+            await self.start()
+        elif not current and self.cycle_started_at <= edited_at:
+            settle = min(deadline, time.monotonic() + WORKER_SETTLE_SEC)
+        self.on_output = on_output
+        try:
+            if not current and not await self.wait_until(lambda: self.cycle_started_at > edited_at, settle):
+                return None
+            ready = current or await self.wait_until(
+                lambda: not self.busy and self.completed_started_at > edited_at, deadline
+            )
+        finally:
+            self.on_output = None
+            self.last_used = time.monotonic()
+        if not self.running and not ready:
+            returncode = self.process.returncode if self.process else None
+            raise RuntimeError(f"Warm worker {self.name} exited with code {returncode}")
+        if ready and tree is not None:
+            self.accepted = (tree, self.generation)
+
+        run_id = uuid.uuid4().hex[:12]
+        output = self.last_output
+        register_run_log(run_id).write_text(output, encoding="utf-8")
+        encoded = output.encode("utf-8")
+        result = {
+            "command": self.command,
+            "returncode": 0 if ready and self.last_passed else 1,
+            "run_id": run_id,
+            "log_bytes": len(encoded),
+            "stdout": encoded[-TAIL_BYTES:].decode("utf-8", errors="replace"),
+            "stderr": "",
+            "warm": True,
+            "worker_generation": self.generation,
+        }
+        if not ready:
+            result["timed_out"] = True
+            raise RuntimeError(json.dumps(result))
+        if result["returncode"] != 0:
+            raise RuntimeError(json.dumps(result))
+        return result
+
+    def status(self) -> dict:
+        pid = self.process.pid if self.process is not None and self.running else None
+        return {
+            "name": self.name,
+            "command": self.command,
+            "root": str(self.cwd),
+            "running": self.running,
+            "pid": pid,
+            "busy": self.busy,
+            "generation": self.generation,
+            "restarts": self.restarts,
+            "idle_sec": round(time.monotonic() - self.last_used, 1),
+            "rss_bytes": process_tree_rss(pid) if pid is not None else None,
+        }
+
+
+class VitestWorker(WarmWorker):
+    FILE_STATUS_RE = re.compile(r"^\s*([✓❯×↓])\s+(\S+\.(?:test|spec)\.[cm]?[jt]sx?)")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.file_status: dict[str, bool] = {}
+
+    async def start(self) -> None:
+        self.file_status = {}
+        await super().start()
+
+    def cycle_passed(self, match: re.Match, output: str) -> bool:
+        # Watch-mode reruns only cover affected files, so merge them into the last known state.
+        for line in output.splitlines():
+            status = self.FILE_STATUS_RE.match(line)
+            if status:
+                self.file_status[status.group(2)] = status.group(1) in ("✓", "↓")
+        return "Tests failed" not in output and all(self.file_status.values())
+
+
+class WorkerSupervisor:
+    def __init__(self):
+        self.workers: dict[tuple[Path, str], WarmWorker] = {}
+
+    def get(self, root: Path, name: str, factory: Callable[[], WarmWorker]) -> WarmWorker:
+        worker = self.workers.get((root, name))
+        if worker is None:
+            worker = self.workers[(root, name)] = factory()
+        return worker
+
+    async def check_health(self) -> None:
+        now = time.monotonic()
+        for worker in list(self.workers.values()):
+            if worker.running:
+                if now - worker.last_used > WORKER_IDLE_SEC:
+                    await worker.stop()
+                    continue
+                rss = process_tree_rss(worker.process.pid) if worker.process else None
+                if rss is not None and rss > WORKER_MAX_RSS_BYTES:
+                    await worker.restart()
+            elif worker.process is not None and not worker.stopping:
+                if worker.restarts < WORKER_MAX_RESTARTS and now - worker.last_used <= WORKER_IDLE_SEC:
+                    await worker.restart()
+                else:
+                    await worker.stop()
+
+    async def monitor(self) -> None:
+        while True:
+            await asyncio.sleep(WORKER_HEALTH_INTERVAL_SEC)
+            with contextlib.suppress(Exception):
+                await self.check_health()
+
+    async def shutdown(self) -> None:
+        for worker in list(self.workers.values()):
+            await worker.stop()
+
+    def status(self) -> list[dict]:
+        return [worker.status() for worker in self.workers.values()]
+
+
+SUPERVISOR = WorkerSupervisor()
+
+
+def js_exec_prefix() -> list[str]:
+    pkg = detect_package_manager()
+    if pkg == "pnpm":
+        return ["pnpm", "exec"]
+    if pkg == "yarn":
+        return ["yarn"]
+    return ["npx"]
+
+
+def warm_worker_name(check: str, command: list[str]) -> Optional[str]:
+    if check == "typecheck" and "tsc" in command:
+        return "tsc"
+    if check == "tests" and command == resolve_test_command(None):
+        return "vitest" if current_project().profile["test_runner"] == "vitest" else None
+    return None
+
+
+def build_warm_worker(name: str) -> WarmWorker:
+    if name == "tsc":
+        return WarmWorker(
+            name,
+            [*js_exec_prefix(), "tsc", "--watch", "--preserveWatchOutput", "--pretty", "false", "-p", "."],
+            project_root(),
+            r"Starting compilation in watch mode|File change detected",
+            r"Found (\d+) errors?\. Watching for file changes",
+        )
+    return VitestWorker(
+        name,
+        [*js_exec_prefix(), "vitest", "--watch"],
+        project_root(),
+        r"\b(RERUN|DEV)\b",
+        r"(Waiting|Watching) for file changes",
+    )
+
+
+ANSI_RE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+TSC_DIAGNOSTIC_RE = re.compile(r"^(.+?)\((\d+),(\d+)\): (error|warning) (TS\d+): (.*)$")
+MYPY_DIAGNOSTIC_RE = re.compile(r"^(.+?):(\d+):(?:(\d+):)? (error|warning): (.*?)(?:  \[([\w-]+)\])?$")
+VITEST_FAIL_RE = re.compile(r"^\s*FAIL\s+(\S+)\s+>\s+(.+)$")
+VITEST_LOCATION_RE = re.compile(r"^\s*❯\s+(\S+?):(\d+):\d+")
+REPORT_FILE_REPORTERS = ("vitest-json", "jest-json", "junit", "eslint-json", "ruff-json")
+DURATION_REPORTERS = ("vitest-json", "jest-json", "junit")
+WARM_REPORTERS = {"tsc": "tsc-text", "vitest": "vitest-text"}
+
+
+def reporter_for(check: str, command: list[str]) -> Optional[str]:
+    if check == "tests":
+        if command[0] == "pytest":
+            return "junit"
+        return {"vitest": "vitest-json", "jest": "jest-json"}.get(current_project().profile["test_runner"])
+    if check == "lint":
+        if command[0] == "ruff":
+            return "ruff-json"
+        return "eslint-json" if "eslint" in command else None
+    if check == "typecheck":
+        if "tsc" in command:
+            return "tsc-text"
+        if command[0] == "pyright":
+            return "pyright-json"
+        if command[0] == "mypy":
+            return "mypy-text"
+    return None
+
+
+def with_reporter(command: list[str], reporter: Optional[str], report_path: Path) -> list[str]:
+    path = str(report_path)
+    if reporter == "vitest-json":
+        args = ["--reporter=default", "--reporter=json", f"--outputFile.json={path}"]
+    elif reporter == "jest-json":
+        args = ["--json", f"--outputFile={path}"]
+    elif reporter == "junit":
+        args = [f"--junitxml={path}"]
+    elif reporter == "eslint-json":
+        args = ["-f", "json", "-o", path]
+    elif reporter == "ruff-json":
+        args = ["--output-format", "json", "--output-file", path]
+    elif reporter == "pyright-json":
+        args = ["--outputjson"]
+    elif reporter == "tsc-text":
+        args = ["--pretty", "false"]
+    elif reporter == "mypy-text":
+        args = ["--show-column-numbers", "--no-pretty", "--no-error-summary"]
+    else:
+        return command
+    if command[0] == "npm" and "--" not in command:
+        return [*command, "--", *args]
+    return [*command, *args]
+
+
+def relative_to_root(path: Optional[str]) -> Optional[str]:
+    if not path:
+        return None
+    candidate = Path(path)
+    if candidate.is_absolute():
+        try:
+            return candidate.resolve().relative_to(project_root()).as_posix()
+        except ValueError:
+            return candidate.as_posix()
+    posix = candidate.as_posix()
+    return posix[2:] if posix.startswith("./") else posix
+
+
+def summarize_message(text: str) -> str:
+    lines = [line.strip() for line in ANSI_RE.sub("", text or "").splitlines() if line.strip()]
+    return "\n".join(lines[:3])[:DIAGNOSTIC_MESSAGE_CHARS]
+
+
+def diagnostic(
+    file: Optional[str],
+    line: Optional[Union[int, str]],
+    rule: Optional[str],
+    message: str,
+    severity: str = "error",
+    column: Optional[Union[int, str]] = None,
+) -> dict:
+    return {
+        "file": relative_to_root(file),
+        "line": int(line) if line else None,
+        "column": int(column) if column else None,
+        "rule": rule,
+        "severity": severity,
+        "message": summarize_message(message),
+    }
+
+
+def line_from_stack(text: str, file: Optional[str]) -> Optional[int]:
+    if not file:
+        return None
+    match = re.search(re.escape(Path(file).name) + r":(\d+)\b", ANSI_RE.sub("", text))
+    return int(match.group(1)) if match else None
+
+
+def parse_jest_json(path: Path) -> Iterable[dict]:
+    data = json.loads(path.read_text(encoding="utf-8", errors="replace"))
+    for suite in data.get("testResults", []):
+        file = suite.get("name") or suite.get("testFilePath")
+        failures = 0
+        for test in suite.get("assertionResults", []):
+            if test.get("status") != "failed":
+                continue
+            failures += 1
+            message = "\n".join(test.get("failureMessages") or [])
+            line = (test.get("location") or {}).get("line") or line_from_stack(message, file)
+            yield diagnostic(file, line, test.get("fullName") or test.get("title"), message)
+        if suite.get("status") == "failed" and not failures and suite.get("message"):
+            yield diagnostic(file, line_from_stack(suite["message"], file), "suite", suite["message"])
+
+
+def junit_case_file(case: ET.Element) -> Optional[str]:
+    if case.get("file"):
+        return case.get("file")
+    parts = (case.get("classname") or "").split(".")
+    for end in range(len(parts), 0, -1):
+        candidate = "/".join(parts[:end]) + ".py"
+        if (project_root() / candidate).is_file():
+            return candidate
+    return None
+
+
+def parse_junit_xml(path: Path) -> Iterable[dict]:
+    for case in ET.parse(path).getroot().iter("testcase"):
+        failure = case.find("failure")
+        if failure is None:
+            failure = case.find("error")
+        if failure is None:
+            continue
+        file = junit_case_file(case)
+        message = failure.get("message") or failure.text or failure.tag
+        line = line_from_stack(failure.text or "", file) or case.get("line")
+        yield diagnostic(file, line, f"{case.get('classname')}::{case.get('name')}", message)
+
+
+def parse_eslint_json(path: Path) -> Iterable[dict]:
+    for result in json.loads(path.read_text(encoding="utf-8", errors="replace")):
+        for message in result.get("messages", []):
+            severity = "error" if message.get("severity") == 2 else "warning"
+            yield diagnostic(
+                result.get("filePath"),
+                message.get("line"),
+                message.get("ruleId"),
+                message.get("message", ""),
+                severity,
+                message.get("column"),
+            )
+
+
+def parse_ruff_json(path: Path) -> Iterable[dict]:
+    for item in json.loads(path.read_text(encoding="utf-8", errors="replace")):
+        location = item.get("location") or {}
+        yield diagnostic(
+            item.get("filename"),
+            location.get("row"),
+            item.get("code"),
+            item.get("message", ""),
+            column=location.get("column"),
+        )
+
+
+def parse_pyright_json(path: Path) -> Iterable[dict]:
+    text = path.read_text(encoding="utf-8", errors="replace")
+    data, _ = json.JSONDecoder().raw_decode(text[text.index("{") :])
+    for item in data.get("generalDiagnostics", []):
+        if item.get("severity") not in ("error", "warning"):
+            continue
+        start = (item.get("range") or {}).get("start") or {}
+        yield diagnostic(
+            item.get("file"),
+            start.get("line", -1) + 1,
+            item.get("rule"),
+            item.get("message", ""),
+            item["severity"],
+            start.get("character", -1) + 1,
+        )
+
+
+def iter_log_lines(path: Path) -> Iterable[str]:
+    with path.open(encoding="utf-8", errors="replace") as handle:
+        for line in handle:
+            yield ANSI_RE.sub("", line.rstrip("\n"))
+
+
+def parse_tsc_text(path: Path) -> Iterable[dict]:
+    for line in iter_log_lines(path):
+        match = TSC_DIAGNOSTIC_RE.match(line)
+        if match:
+            file, row, column, severity, code, message = match.groups()
+            yield diagnostic(file, row, code, message, severity, column)
+
+
+def parse_mypy_text(path: Path) -> Iterable[dict]:
+    for line in iter_log_lines(path):
+        match = MYPY_DIAGNOSTIC_RE.match(line)
+        if match:
+            file, row, column, severity, message, code = match.groups()
+            yield diagnostic(file, row, code, message, severity, column)
+
+
+def parse_vitest_text(path: Path) -> Iterable[dict]:
+    current: Optional[dict] = None
+    for line in iter_log_lines(path):
+        match = VITEST_FAIL_RE.match(line)
+        if match:
+            if current:
+                yield diagnostic(**current)
+            current = {"file": match.group(1), "line": None, "rule": match.group(2), "message": ""}
+        elif current is not None:
+            location = VITEST_LOCATION_RE.match(line)
+            if location and current["line"] is None and location.group(1).endswith(current["file"]):
+                current["line"] = location.group(2)
+            elif line.strip() and not current["message"]:
+                current["message"] = line
+    if current:
+        yield diagnostic(**current)
+
+
+DIAGNOSTIC_PARSERS: dict[str, Callable[[Path], Iterable[dict]]] = {
+    "vitest-json": parse_jest_json,
+    "jest-json": parse_jest_json,
+    "junit": parse_junit_xml,
+    "eslint-json": parse_eslint_json,
+    "ruff-json": parse_ruff_json,
+    "pyright-json": parse_pyright_json,
+    "tsc-text": parse_tsc_text,
+    "mypy-text": parse_mypy_text,
+    "vitest-text": parse_vitest_text,
+}
+
+
+def collect_diagnostics(reporter: Optional[str], report_path: Path, run_id: Optional[str]) -> Optional[list[dict]]:
+    if reporter is None:
+        return None
+    source = report_path if reporter in REPORT_FILE_REPORTERS else _RUN_LOGS.get(run_id or "")
+    if source is None or not source.exists():
+        return None
+    unique: dict[tuple, dict] = {}
+    try:
+        with timed("phase.diagnostics"):
+            records = list(DIAGNOSTIC_PARSERS[reporter](source))
+        for record in records:
+            key = (record["file"], record["line"], record["rule"], record["message"])
+            if key in unique:
+                unique[key]["count"] = unique[key].get("count", 1) + 1
+            elif len(unique) < MAX_DIAGNOSTICS:
+                unique[key] = record
+    except (OSError, ValueError, ET.ParseError, AttributeError, TypeError):
+        return None
+    return sorted(unique.values(), key=lambda record: (record["file"] or "", record["line"] or 0))
+
+
+def source_snippet(file: Optional[str], line: Optional[int]) -> Optional[str]:
+    if not file or not line:
+        return None
+    path = str(project_root() / file)
+    linecache.checkcache(path)
+    text = linecache.getline(path, line).strip()
+    return text[:SNIPPET_CHARS] or None
+
+
+def present_result(result: dict, offset: int = 0, limit: int = 50, raw: bool = False) -> dict:
+    records = result.pop("diagnostics", None)
+    if records is not None:
+        page = records[offset : offset + limit]
+        files: dict[str, list[dict]] = {}
+        for record in page:
+            entry = {key: value for key, value in record.items() if key != "file" and value is not None}
+            snippet = source_snippet(record["file"], record["line"])
+            if snippet:
+                entry["snippet"] = snippet
+            files.setdefault(record["file"] or "<unknown>", []).append(entry)
+        next_offset = offset + len(page)
+        result["diagnostics"] = {
+            "total": sum(record.get("count", 1) for record in records),
+            "unique": len(records),
+            "offset": offset,
+            "limit": limit,
+            "next_offset": next_offset if next_offset < len(records) else None,
+            "files": files,
+        }
+    if raw:
+        return result
+    if records or result.get("returncode") == 0:
+        result.pop("stdout", None)
+        result.pop("stderr", None)
+    else:
+        for stream in ("stdout", "stderr"):
+            if result.get(stream):
+                result[stream] = result[stream][-FALLBACK_TAIL_CHARS:]
+    return result
+
+
+async def presented(run: Awaitable[dict], offset: int, limit: int, raw: bool) -> dict:
+    try:
+        result = await run
+    except RuntimeError as exc:
+        payload = failure_payload(exc)
+        if "returncode" not in payload:
+            raise
+        raise RuntimeError(json.dumps(present_result(payload, offset, limit, raw))) from exc
+    return present_result(result, offset, limit, raw)
+
+
+def collect_durations(reporter: Optional[str], report_path: Path) -> dict[str, float]:
+    if reporter not in DURATION_REPORTERS or not report_path.exists():
+        return {}
+    durations: dict[str, float] = {}
+    try:
+        if reporter == "junit":
+            for case in ET.parse(report_path).getroot().iter("testcase"):
+                file = relative_to_root(junit_case_file(case))
+                if file:
+                    durations[file] = durations.get(file, 0.0) + float(case.get("time") or 0)
+            return durations
+        for suite in json.loads(report_path.read_text(encoding="utf-8", errors="replace")).get("testResults", []):
+            file = relative_to_root(suite.get("name") or suite.get("testFilePath"))
+            stats = suite.get("perfStats") or {}
+            start = suite.get("startTime") or stats.get("start")
+            end = suite.get("endTime") or stats.get("end")
+            if file and start and end:
+                durations[file] = max(0.0, (end - start) / 1000)
+    except (OSError, ValueError, ET.ParseError, AttributeError, TypeError):
+        return {}
+    return durations
+
+
+def open_timings_db() -> sqlite3.Connection:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(TIMINGS_DB, timeout=5)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS timings ("
+        "root TEXT NOT NULL, file TEXT NOT NULL, seconds REAL NOT NULL, runs INTEGER NOT NULL, "
+        "updated REAL NOT NULL, PRIMARY KEY (root, file))"
+    )
+    return connection
+
+
+def load_timings(root: Path) -> dict[str, float]:
+    try:
+        with contextlib.closing(open_timings_db()) as connection:
+            rows = connection.execute("SELECT file, seconds FROM timings WHERE root = ?", (str(root),)).fetchall()
+    except sqlite3.Error:
+        return {}
+    return dict(rows)
+
+
+def record_timings(root: Path, durations: dict[str, float]) -> None:
+    if not durations:
+        return
+    try:
+        with contextlib.closing(open_timings_db()) as connection, connection:
+            for file, seconds in durations.items():
+                connection.execute(
+                    "INSERT INTO timings (root, file, seconds, runs, updated) VALUES (?, ?, ?, 1, ?) "
+                    "ON CONFLICT (root, file) DO UPDATE SET "
+                    "seconds = seconds * (1 - ?) + excluded.seconds * ?, runs = runs + 1, updated = excluded.updated",
+                    (str(root), file, seconds, time.time(), TIMING_SMOOTHING, TIMING_SMOOTHING),
+                )
+    except sqlite3.Error:
+        pass
+
+
+def plan_shards(files: list[str], count: int, timings: dict[str, float]) -> list[dict]:
+    known = sorted(timings[file] for file in files if file in timings)
+    default = known[len(known) // 2] if known else DEFAULT_TEST_FILE_SEC
+    shards = [{"files": [], "predicted_sec": 0.0} for _ in range(count)]
+    heap = [(0.0, index) for index in range(count)]
+    # Longest-processing-time first: place each file on the currently lightest shard.
+    for file in sorted(files, key=lambda name: (-timings.get(name, default), name)):
+        load, index = heapq.heappop(heap)
+        load += timings.get(file, default)
+        shards[index]["files"].append(file)
+        shards[index]["predicted_sec"] = round(load, 3)
+        heapq.heappush(heap, (load, index))
+    for shard in shards:
+        shard["files"].sort()
+    return [shard for shard in shards if shard["files"]]
+
+
+def test_listing_command(javascript: bool) -> Optional[list[str]]:
+    if not javascript:
+        return [*build_pytest_command(None), "--collect-only"]
+    runner = current_project().profile["test_runner"]
+    if runner == "vitest":
+        return [*js_exec_prefix(), "vitest", "list", "--filesOnly"]
+    if runner == "jest":
+        return [*js_exec_prefix(), "jest", "--listTests"]
+    return None
+
+
+async def list_test_files(javascript: bool) -> list[str]:
+    # Ask the runner, so testpaths and include/exclude settings match what the unsharded suite collects.
+    command = test_listing_command(javascript)
+    if command is not None:
+        try:
+            result = await run_command(command, TEST_LIST_TIMEOUT_SEC)
+        except (RuntimeError, OSError):
+            result = None
+        log_path = _RUN_LOGS.get(result["run_id"]) if result is not None else None
+        if log_path is not None:
+            files = set()
+            for line in iter_log_lines(log_path):
+                path = relative_to_root(line.strip().split("::", 1)[0])
+                if path and (project_root() / path).is_file():
+                    files.add(path)
+            if files:
+                return sorted(files)
+    return sorted(path for path in iter_project_files(project_root()) if is_test_file(path, javascript))
+
+
+def check_runner(
+    check: str, command: list[str], tree: Optional[str] = None, force: bool = False
+) -> Callable[..., Awaitable[dict]]:
+    # force asks for a real rerun, which a watcher with nothing new to react to cannot provide.
+    warm_name = warm_worker_name(check, command) if DAEMON_MODE and not force else None
+    worker = SUPERVISOR.get(project_root(), warm_name, lambda: build_warm_worker(warm_name)) if warm_name else None
+    cold_reporter = reporter_for(check, command)
+
+    async def run(command: list[str], timeout: int, on_output: Optional[OutputCallback] = None) -> dict:
+        SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+        report_path = SPOOL_DIR / f"{uuid.uuid4().hex[:12]}.report"
+        reporter = WARM_REPORTERS[worker.name] if worker is not None else cold_reporter
+        try:
+            try:
+                result = await worker.run(command, timeout, on_output, tree) if worker is not None else None
+                if result is None:
+                    # The watcher has not started a cycle for the current edits, so its output may be stale.
+                    reporter = cold_reporter
+                    result = await run_command(with_reporter(command, reporter, report_path), timeout, on_output)
+            except RuntimeError as exc:
+                payload = failure_payload(exc)
+                if "returncode" not in payload:
+                    raise
+                payload["diagnostics"] = collect_diagnostics(reporter, report_path, payload.get("run_id"))
+                record_timings(project_root(), collect_durations(reporter, report_path))
+                raise RuntimeError(json.dumps(payload)) from exc
+            result["diagnostics"] = collect_diagnostics(reporter, report_path, result.get("run_id"))
+            record_timings(project_root(), collect_durations(reporter, report_path))
+            return result
+        finally:
+            report_path.unlink(missing_ok=True)
+
+    return run
+
+
+async def execute_check(
+    check: str,
+    command: list[str],
+    timeout: int,
+    tree: Optional[str],
+    force: bool = False,
+    on_output: Optional[OutputCallback] = None,
+) -> dict:
+    return await run_cached(command, timeout, tree, force, on_output, check_runner(check, command, tree, force))
+
+
+def build_js_command(base: list[str], pattern: Optional[str], files: Optional[list[str]] = None) -> list[str]:
+    command = list(base)
+    if base[0] == "npm" and (files or pattern):
+        command.append("--")
+    if files:
+        command.extend(files)
     if pattern:
-        return [*base, "-t", pattern]
-    return base
+        command.extend(["-t", pattern])
+    return command
 
 
-def build_pytest_command(pattern: Optional[str]) -> list[str]:
+def build_pytest_command(pattern: Optional[str], files: Optional[list[str]] = None) -> list[str]:
     command = ["pytest", "-q"]
     if pattern:
         command.extend(["-k", pattern])
+    if files:
+        command.extend(files)
     return command
 
 
@@ -118,83 +1938,356 @@ def ensure_safe_diff(unified_diff: str) -> None:
 
 
 @server.tool()
-async def run_tests(pattern: Optional[str] = None, timeout_sec: int = 300) -> dict:
+@instrumented
+async def describe_project(refresh: bool = False, project: Optional[str] = None) -> dict:
+    return get_project_profile(get_project(project).root, refresh=refresh)
+
+
+def resolve_test_command(pattern: Optional[str], files: Optional[list[str]] = None) -> list[str]:
     if is_javascript_project():
         pkg = detect_package_manager()
         if pkg == "pnpm":
-            command = build_js_command(["pnpm", "test"], pattern)
-        elif pkg == "yarn":
-            command = build_js_command(["yarn", "test"], pattern)
-        else:
-            command = build_js_command(["npm", "test"], pattern)
-    elif is_python_project():
-        command = build_pytest_command(pattern)
-    else:
-        raise RuntimeError("Unable to detect project type for tests")
-
-    return await run_command(command, timeout_sec)
+            return build_js_command(["pnpm", "test"], pattern, files)
+        if pkg == "yarn":
+            return build_js_command(["yarn", "test"], pattern, files)
+        return build_js_command(["npm", "test"], pattern, files)
+    if is_python_project():
+        return build_pytest_command(pattern, files)
+    raise RuntimeError("Unable to detect project type for tests")
 
 
-@server.tool()
-async def run_lint(timeout_sec: int = 180) -> dict:
+def resolve_lint_command() -> list[str]:
     if is_javascript_project():
         pkg = detect_package_manager()
         if pkg == "pnpm":
-            command = ["pnpm", "exec", "eslint", "."]
-        elif pkg == "yarn":
-            command = ["yarn", "eslint", "."]
-        else:
-            command = ["npx", "eslint", "."]
-    elif is_python_project():
-        command = ["ruff", "check", "."]
-    else:
-        raise RuntimeError("Unable to detect project type for lint")
+            return ["pnpm", "exec", "eslint", "."]
+        if pkg == "yarn":
+            return ["yarn", "eslint", "."]
+        return ["npx", "eslint", "."]
+    if is_python_project():
+        return ["ruff", "check", "."]
+    raise RuntimeError("Unable to detect project type for lint")
 
-    return await run_command(command, timeout_sec)
 
-
-@server.tool()
-async def run_typecheck(timeout_sec: int = 300) -> dict:
+def resolve_typecheck_command() -> list[str]:
     if is_typescript_project() and is_javascript_project():
         pkg = detect_package_manager()
         if pkg == "pnpm":
-            command = ["pnpm", "exec", "tsc", "-p", "."]
-        elif pkg == "yarn":
-            command = ["yarn", "tsc", "-p", "."]
-        else:
-            command = ["npx", "tsc", "-p", "."]
-    elif is_python_project():
+            return ["pnpm", "exec", "tsc", "-p", "."]
+        if pkg == "yarn":
+            return ["yarn", "tsc", "-p", "."]
+        return ["npx", "tsc", "-p", "."]
+    if is_python_project():
         if shutil.which("pyright"):
-            command = ["pyright"]
+            return ["pyright"]
+        return ["mypy", "."]
+    raise RuntimeError("Unable to detect project type for typecheck")
+
+
+def available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
+async def run_test_shards(
+    files: list[str],
+    shard_count: int,
+    pattern: Optional[str],
+    timeout: int,
+    tree: Optional[str],
+    force: bool,
+    progress: ProgressReporter,
+) -> dict:
+    plan = plan_shards(files, shard_count, load_timings(project_root()))
+    deadline = time.monotonic() + timeout
+    semaphore = asyncio.Semaphore(available_cores())
+
+    async def run_shard(index: int, shard: dict) -> dict:
+        async with semaphore:
+            started = time.perf_counter()
+            command = resolve_test_command(pattern, shard["files"])
+            remaining = max(1, int(deadline - time.monotonic()))
+            try:
+                result = await execute_check("tests", command, remaining, tree, force, progress(f"shard{index}"))
+            except (RuntimeError, OSError) as exc:
+                result = failure_payload(exc)
+            result["index"] = index
+            result["wall_sec"] = round(time.perf_counter() - started, 3)
+            return result
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run_shard(index, shard) for index, shard in enumerate(plan)))
+    records = [result.get("diagnostics") for result in results]
+    merged = {
+        "command": [result.get("command") for result in results],
+        "returncode": 0 if all(result.get("returncode") == 0 for result in results) else 1,
+        "cached": all(result.get("cached") for result in results),
+        "wall_sec": round(time.perf_counter() - started, 3),
+        "shards": [
+            {
+                "index": result["index"],
+                "files": len(shard["files"]),
+                "predicted_sec": shard["predicted_sec"],
+                "wall_sec": result["wall_sec"],
+                "returncode": result.get("returncode"),
+                "run_id": result.get("run_id"),
+                "cached": result.get("cached", False),
+                **({"timed_out": True} if result.get("timed_out") else {}),
+                **({"error": result["error"]} if "error" in result else {}),
+            }
+            for shard, result in zip(plan, results)
+        ],
+        "diagnostics": None
+        if all(record is None for record in records)
+        else sorted(
+            (record for shard_records in records for record in shard_records or ()),
+            key=lambda record: (record["file"] or "", record["line"] or 0),
+        ),
+    }
+    if any(result.get("timed_out") for result in results):
+        merged["timed_out"] = True
+    if merged["returncode"] != 0:
+        raise RuntimeError(json.dumps(merged))
+    return merged
+
+
+async def run_check(
+    name: str,
+    command: list[str],
+    timeout: int,
+    semaphore: asyncio.Semaphore,
+    tree: Optional[str],
+    force: bool,
+    page: tuple[int, int, bool],
+    progress: ProgressReporter,
+) -> dict:
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            result = await execute_check(name, command, timeout, tree, force, progress(name))
+            status = "passed"
+        except (RuntimeError, OSError) as exc:
+            result = failure_payload(exc)
+            status = "timed_out" if result.get("timed_out") else "failed"
+        result = present_result(result, *page)
+        return {"status": status, "duration_sec": round(time.perf_counter() - started, 3), **result}
+
+
+@server.tool()
+@instrumented
+async def run_tests(
+    pattern: Optional[str] = None,
+    timeout_sec: int = 300,
+    force: bool = False,
+    affected: bool = False,
+    shards: int = 0,
+    offset: int = 0,
+    limit: int = 50,
+    raw: bool = False,
+    project: Optional[str] = None,
+    ctx: Optional[Context] = None,
+) -> dict:
+    async with project_session(project):
+        selection = await select_affected_tests() if affected else None
+        selected = selection["tests"] if selection is not None and selection["fallback"] is None else None
+        if selected == []:
+            return {"command": None, "returncode": 0, "cached": False, "affected": selection}
+        tree = await working_tree_hash()
+        files = selected
+        if files is None and shards > 1:
+            files = await list_test_files(is_javascript_project())
+        if shards > 1 and files is not None and len(files) > 1:
+            run = run_test_shards(files, shards, pattern, timeout_sec, tree, force, progress_reporter(ctx))
         else:
-            command = ["mypy", "."]
-    else:
-        raise RuntimeError("Unable to detect project type for typecheck")
+            command = resolve_test_command(pattern, selected)
+            run = execute_check("tests", command, timeout_sec, tree, force, progress_reporter(ctx)(None))
+        try:
+            result = await presented(run, offset, limit, raw)
+        except RuntimeError as exc:
+            payload = failure_payload(exc)
+            if selection is None or "returncode" not in payload:
+                raise
+            raise RuntimeError(json.dumps({**payload, "affected": selection})) from exc
+        if selection is not None:
+            result["affected"] = selection
+        return result
+
 
-    return await run_command(command, timeout_sec)
+@server.tool()
+@instrumented
+async def run_lint(
+    timeout_sec: int = 180,
+    force: bool = False,
+    offset: int = 0,
+    limit: int = 50,
+    raw: bool = False,
+    project: Optional[str] = None,
+    ctx: Optional[Context] = None,
+) -> dict:
+    async with project_session(project):
+        command = resolve_lint_command()
+        tree = await working_tree_hash()
+        return await presented(
+            execute_check("lint", command, timeout_sec, tree, force, progress_reporter(ctx)(None)),
+            offset,
+            limit,
+            raw,
+        )
 
 
 @server.tool()
-async def apply_patch(unified_diff: str, dry_run: bool = True) -> dict:
-    ensure_safe_diff(unified_diff)
-    diff_path = ROOT / ".testops.patch"
-    diff_path.write_text(unified_diff, encoding="utf-8")
-    try:
-        await run_command(["git", "apply", "--check", str(diff_path)], timeout=30)
-        if not dry_run:
-            await run_command(["git", "apply", str(diff_path)], timeout=30)
-    finally:
-        if diff_path.exists():
-            diff_path.unlink()
-    return {"status": "ok", "applied": not dry_run}
+@instrumented
+async def run_typecheck(
+    timeout_sec: int = 300,
+    force: bool = False,
+    offset: int = 0,
+    limit: int = 50,
+    raw: bool = False,
+    project: Optional[str] = None,
+    ctx: Optional[Context] = None,
+) -> dict:
+    async with project_session(project):
+        command = resolve_typecheck_command()
+        tree = await working_tree_hash()
+        return await presented(
+            execute_check("typecheck", command, timeout_sec, tree, force, progress_reporter(ctx)(None)),
+            offset,
+            limit,
+            raw,
+        )
+
+
+@server.tool()
+@instrumented
+async def run_all_checks(
+    pattern: Optional[str] = None,
+    timeout_sec: int = 300,
+    fail_fast: bool = False,
+    max_parallel: Optional[int] = None,
+    force: bool = False,
+    offset: int = 0,
+    limit: int = 50,
+    raw: bool = False,
+    project: Optional[str] = None,
+    ctx: Optional[Context] = None,
+) -> dict:
+    async with project_session(project):
+        started = time.perf_counter()
+        tree = await working_tree_hash()
+        resolvers = {
+            "tests": lambda: resolve_test_command(pattern),
+            "lint": resolve_lint_command,
+            "typecheck": resolve_typecheck_command,
+        }
+        checks: dict[str, dict] = {}
+        commands: dict[str, list[str]] = {}
+        for name, resolve in resolvers.items():
+            try:
+                commands[name] = resolve()
+            except RuntimeError as exc:
+                checks[name] = {"status": "skipped", "error": str(exc)}
+
+        parallelism = max(1, min(len(commands) or 1, max_parallel or available_cores(), available_cores()))
+        semaphore = asyncio.Semaphore(parallelism)
+        progress = progress_reporter(ctx)
+        tasks = {
+            asyncio.create_task(
+                run_check(name, command, timeout_sec, semaphore, tree, force, (offset, limit, raw), progress)
+            ): name
+            for name, command in commands.items()
+        }
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    checks[tasks[task]] = task.result()
+                if fail_fast and any(checks[tasks[task]]["status"] != "passed" for task in done):
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        for task in pending:
+            checks[tasks[task]] = {"status": "cancelled", "command": commands[tasks[task]]}
+
+        ordered = {name: checks[name] for name in resolvers if name in checks}
+        return {
+            "ok": all(check["status"] in ("passed", "skipped") for check in ordered.values()),
+            "duration_sec": round(time.perf_counter() - started, 3),
+            "parallelism": parallelism,
+            "checks": ordered,
+        }
+
+
+@server.tool()
+@instrumented
+async def describe_workers() -> dict:
+    return {"daemon_mode": DAEMON_MODE, "workers": SUPERVISOR.status()}
 
 
 @server.tool()
-async def git_commit(message: str) -> dict:
+@instrumented
+async def read_log(run_id: str, offset: int = 0, limit: int = 20_000) -> dict:
+    path = _RUN_LOGS.get(run_id)
+    if path is None or not path.exists():
+        raise ValueError(f"Unknown or expired run_id: {run_id}")
+    if offset < 0:
+        raise ValueError("offset must be non-negative")
+    limit = max(1, min(limit, MAX_LOG_CHARS))
+    size = path.stat().st_size
+    with path.open("rb") as handle:
+        handle.seek(offset)
+        data = handle.read(limit)
+    next_offset = offset + len(data)
+    return {
+        "run_id": run_id,
+        "offset": offset,
+        "next_offset": next_offset,
+        "size": size,
+        "eof": next_offset >= size,
+        "text": data.decode("utf-8", errors="replace"),
+    }
+
+
+@server.tool()
+@instrumented
+async def apply_patch(unified_diff: str, dry_run: bool = True, project: Optional[str] = None) -> dict:
+    async with project_session(project):
+        ensure_safe_diff(unified_diff)
+        diff_path = project_root() / ".testops.patch"
+        diff_path.write_text(unified_diff, encoding="utf-8")
+        try:
+            await run_command(["git", "apply", "--check", str(diff_path)], timeout=30)
+            if not dry_run:
+                await run_command(["git", "apply", str(diff_path)], timeout=30)
+                current_project().patched_files |= await project_relative_paths(diff_paths(unified_diff))
+                current_project().patched_at = time.time()
+        finally:
+            if diff_path.exists():
+                diff_path.unlink()
+        return {"status": "ok", "applied": not dry_run}
+
+
+@server.tool()
+@instrumented
+async def git_commit(message: str, project: Optional[str] = None) -> dict:
     if not message.strip():
         raise ValueError("Commit message is required")
-    await run_command(["git", "commit", "-m", message, "--no-verify"], timeout=30)
-    return {"status": "committed", "message": message}
+    async with project_session(project):
+        await run_command(["git", "commit", "-m", message, "--no-verify"], timeout=30)
+        current_project().patched_files = set()
+        return {"status": "committed", "message": message}
+
+
+@server.tool()
+async def get_metrics(reset: bool = False) -> dict:
+    snapshot = METRICS.snapshot()
+    if reset:
+        METRICS.reset()
+    return snapshot
 
 
 if __name__ == "__main__":
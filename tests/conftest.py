@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "mcp_servers"))
+
+import testops_server as testops  # noqa: E402
+
+
+def write(root: Path, rel_path: str, content: str) -> Path:
+    path = root / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding="utf-8")
+    return path
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(testops, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(testops, "TIMINGS_DB", tmp_path / "cache" / "timings.sqlite3")
+
+
+@pytest.fixture
+def project(tmp_path):
+    root = tmp_path / "project"
+    root.mkdir()
+    with testops.use_project(testops.get_project(str(root))):
+        yield root
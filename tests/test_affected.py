@@ -0,0 +1,103 @@
+import asyncio
+import json
+import subprocess
+
+import testops_server as testops
+from conftest import write
+
+
+def git(root, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.invalid", *args],
+        cwd=root,
+        check=True,
+        capture_output=True,
+    )
+
+
+def python_project(root):
+    write(root, "pkg/__init__.py", "")
+    write(root, "pkg/core.py", "VALUE = 1\n")
+    write(root, "pkg/api.py", "from .core import VALUE\n")
+    write(root, "tests/test_api.py", "from pkg.api import VALUE\n")
+    write(root, "tests/test_other.py", "def test_other():\n    pass\n")
+    write(root, "tests/data.json", "{}\n")
+    git(root, "init", "-q")
+    git(root, "add", "-A")
+    git(root, "commit", "-q", "-m", "init")
+
+
+def test_parse_python_imports_resolves_relative_imports():
+    source = "import os, json as j\nfrom . import sibling\nfrom ..core import (thing, other as alias)\n"
+
+    imports = testops.parse_python_imports("pkg/sub/mod.py", source)
+
+    assert imports == (
+        "os",
+        "json",
+        "pkg.sub",
+        "pkg.sub.sibling",
+        "pkg.core",
+        "pkg.core.thing",
+        "pkg.core.other",
+    )
+
+
+def test_resolve_js_import_relative_and_alias():
+    files = {"src/lib/math.ts", "src/lib/index.ts", "src/app.tsx"}
+    aliases = {"@": "src"}
+
+    assert testops.resolve_js_import("src/app.tsx", "./lib/math", files, aliases) == "src/lib/math.ts"
+    assert testops.resolve_js_import("src/app.tsx", "./lib/math.js", files, aliases) == "src/lib/math.ts"
+    assert testops.resolve_js_import("src/app.tsx", "@/lib", files, aliases) == "src/lib/index.ts"
+    assert testops.resolve_js_import("src/app.tsx", "react", files, aliases) is None
+
+
+def test_import_graph_dependents(project):
+    write(project, "tsconfig.json", json.dumps({"compilerOptions": {"baseUrl": ".", "paths": {"@/*": ["lib/*"]}}}))
+    write(project, "lib/a.ts", "export const a = 1;\n")
+    write(project, "lib/b.ts", 'import { a } from "./a";\nexport const b = a + 1;\n')
+    write(project, "tests/b.test.ts", 'import { b } from "@/b";\n')
+    write(project, "tests/other.test.ts", 'import { x } from "vitest";\n')
+    write(project, "pkg/__init__.py", "")
+    write(project, "pkg/core.py", "VALUE = 1\n")
+    write(project, "pkg/api.py", "from .core import VALUE\n")
+    write(project, "tests/test_api.py", "from pkg.api import VALUE\n")
+    graph = testops.ImportGraph(project)
+    graph.refresh()
+
+    assert graph.dependents({"lib/a.ts"}) == {"lib/a.ts", "lib/b.ts", "tests/b.test.ts"}
+    assert graph.dependents({"pkg/core.py"}) == {"pkg/core.py", "pkg/api.py", "tests/test_api.py"}
+
+
+def test_select_affected_tests_follows_imports(project):
+    python_project(project)
+    write(project, "pkg/core.py", "VALUE = 2\n")
+
+    selection = asyncio.run(testops.select_affected_tests())
+
+    assert selection["changed"] == ["pkg/core.py"]
+    assert selection["fallback"] is None
+    assert selection["tests"] == ["tests/test_api.py"]
+
+
+def test_select_affected_tests_falls_back_for_data_files(project):
+    python_project(project)
+    write(project, "pkg/core.py", "VALUE = 2\n")
+    write(project, "tests/data.json", '{"changed": true}\n')
+
+    selection = asyncio.run(testops.select_affected_tests())
+
+    assert selection["fallback"] == "tests/data.json is not tracked by the import graph"
+    assert selection["tests"] == []
+
+
+def test_select_affected_tests_falls_back_when_the_scan_is_truncated(project, monkeypatch):
+    python_project(project)
+    write(project, "pkg/core.py", "VALUE = 2\n")
+    monkeypatch.setattr(testops, "MAX_PROFILE_ENTRIES", 3)
+
+    selection = asyncio.run(testops.select_affected_tests())
+
+    assert "import graph is partial" in selection["fallback"]
+    assert selection["tests"] == []
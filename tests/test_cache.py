@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import testops_server as testops
+from conftest import write
+
+COMMAND = ["tool", "--check"]
+
+
+class FakeRunner:
+    def __init__(self, returncode=0, timed_out=False):
+        self.calls = 0
+        self.returncode = returncode
+        self.timed_out = timed_out
+
+    async def __call__(self, command, timeout, on_output=None):
+        self.calls += 1
+        result = {"command": command, "returncode": self.returncode, "stdout": f"run {self.calls}", "stderr": ""}
+        if self.timed_out:
+            result["timed_out"] = True
+        if self.returncode or self.timed_out:
+            raise RuntimeError(json.dumps(result))
+        return result
+
+
+def cached(runner, tree="tree-a", force=False):
+    try:
+        return asyncio.run(testops.run_cached(COMMAND, 30, tree, force, runner=runner))
+    except RuntimeError as exc:
+        return json.loads(str(exc))
+
+
+def test_unchanged_tree_is_served_from_cache(project):
+    runner = FakeRunner()
+
+    first = cached(runner)
+    second = cached(runner)
+
+    assert runner.calls == 1
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["stdout"] == "run 1"
+    assert cached(runner, tree="tree-b")["cached"] is False
+    assert runner.calls == 2
+
+
+def test_force_reruns_and_refreshes_the_entry(project):
+    runner = FakeRunner()
+    cached(runner)
+
+    forced = cached(runner, force=True)
+
+    assert runner.calls == 2
+    assert forced["cached"] is False
+    assert cached(runner)["stdout"] == "run 2"
+
+
+def test_no_tree_disables_caching(project):
+    runner = FakeRunner()
+
+    cached(runner, tree=None)
+    cached(runner, tree=None)
+
+    assert runner.calls == 2
+    assert not testops.CACHE_DIR.exists() or not list(testops.CACHE_DIR.glob("*.json"))
+
+
+def test_failures_are_cached_but_timeouts_are_not(project):
+    failing = FakeRunner(returncode=1)
+    cached(failing)
+    replay = cached(failing)
+    assert failing.calls == 1
+    assert replay["returncode"] == 1
+    assert replay["cached"] is True
+
+    slow = FakeRunner(timed_out=True)
+    cached(slow, tree="tree-b")
+    cached(slow, tree="tree-b")
+    assert slow.calls == 2
+
+
+def test_cached_result_drops_run_id_without_a_log(project):
+    command = [sys.executable, "-c", "print('hello')"]
+    first = asyncio.run(testops.run_cached(command, 30, "tree-a"))
+    assert asyncio.run(testops.run_cached(command, 30, "tree-a"))["run_id"] == first["run_id"]
+
+    testops._RUN_LOGS.pop(first["run_id"])
+    replay = asyncio.run(testops.run_cached(command, 30, "tree-a"))
+
+    assert replay["cached"] is True
+    assert "run_id" not in replay
+    assert "force=true" in replay["log"]
+
+
+def test_expired_entries_are_ignored(project):
+    runner = FakeRunner()
+    cached(runner)
+    for path in testops.CACHE_DIR.glob("*.json"):
+        old = time.time() - testops.CACHE_MAX_AGE_SEC - 60
+        os.utime(path, (old, old))
+
+    assert cached(runner)["cached"] is False
+    assert runner.calls == 2
+
+
+def test_eviction_drops_least_recently_used_entries_over_the_size_limit(project, monkeypatch):
+    testops.CACHE_DIR.mkdir(parents=True)
+    now = time.time()
+    for index in range(3):
+        path = testops.CACHE_DIR / f"entry{index}.json"
+        path.write_text(json.dumps({"failed": False, "result": {"stdout": "x" * 100}}), encoding="utf-8")
+        os.utime(path, (now - 100 + index, now - 100 + index))
+    monkeypatch.setattr(testops, "CACHE_MAX_BYTES", 2 * path.stat().st_size)
+
+    testops.evict_cached_results()
+
+    assert sorted(path.name for path in testops.CACHE_DIR.glob("*.json")) == ["entry1.json", "entry2.json"]
+
+
+def test_tree_hash_sees_racily_clean_edits(project):
+    # Same size and same mtime second as the index entry: only git's racy-entry check can catch the edit.
+    stamp = time.time_ns() - 100 * 10**9
+    path = write(project, "a.txt", "one\n")
+    os.utime(path, ns=(stamp, stamp))
+    for args in (["init", "-q"], ["add", "-A"], ["commit", "-q", "-m", "init"]):
+        git = ["git", "-c", "user.name=t", "-c", "user.email=t@example.invalid", *args]
+        subprocess.run(git, cwd=project, check=True, capture_output=True)
+    os.utime(project / ".git" / "index", ns=(stamp, stamp))
+    before = asyncio.run(testops.working_tree_hash())
+
+    write(project, "a.txt", "two\n")
+    os.utime(path, ns=(stamp, stamp))
+
+    assert asyncio.run(testops.working_tree_hash()) != before
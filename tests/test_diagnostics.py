@@ -0,0 +1,196 @@
+import json
+
+import testops_server as testops
+from conftest import write
+
+
+def test_parse_jest_json(project):
+    report = {
+        "testResults": [
+            {
+                "name": str(project / "src" / "sum.test.ts"),
+                "status": "failed",
+                "assertionResults": [
+                    {"status": "passed", "fullName": "sum adds"},
+                    {
+                        "status": "failed",
+                        "fullName": "sum subtracts",
+                        "failureMessages": [f"Error: expected 1\n    at ({project}/src/sum.test.ts:12:5)"],
+                    },
+                ],
+            },
+            {"name": "src/broken.test.ts", "status": "failed", "assertionResults": [], "message": "SyntaxError"},
+        ]
+    }
+    path = write(project, "report.json", json.dumps(report))
+
+    records = list(testops.parse_jest_json(path))
+
+    assert [(record["file"], record["line"], record["rule"]) for record in records] == [
+        ("src/sum.test.ts", 12, "sum subtracts"),
+        ("src/broken.test.ts", None, "suite"),
+    ]
+    assert records[0]["message"] == f"Error: expected 1\nat ({project}/src/sum.test.ts:12:5)"
+
+
+def test_parse_junit_xml(project):
+    write(project, "tests/test_mod.py", "def test_x():\n    assert False\n")
+    path = write(
+        project,
+        "report.xml",
+        '<testsuites><testsuite name="pytest">'
+        '<testcase classname="tests.test_mod" name="test_ok"/>'
+        '<testcase classname="tests.test_mod" name="test_x">'
+        '<failure message="assert False">&gt;   assert False\n\ntests/test_mod.py:2: AssertionError</failure>'
+        "</testcase></testsuite></testsuites>",
+    )
+
+    records = list(testops.parse_junit_xml(path))
+
+    assert records == [
+        {
+            "file": "tests/test_mod.py",
+            "line": 2,
+            "column": None,
+            "rule": "tests.test_mod::test_x",
+            "severity": "error",
+            "message": "assert False",
+        }
+    ]
+
+
+def test_parse_lint_and_typecheck_json(project):
+    eslint = write(
+        project,
+        "eslint.json",
+        json.dumps(
+            [
+                {
+                    "filePath": str(project / "src" / "a.ts"),
+                    "messages": [
+                        {"ruleId": "no-unused-vars", "severity": 2, "message": "'x' is unused", "line": 3, "column": 7},
+                        {"ruleId": "eqeqeq", "severity": 1, "message": "Use ===", "line": 5, "column": 9},
+                    ],
+                }
+            ]
+        ),
+    )
+    ruff = write(
+        project,
+        "ruff.json",
+        json.dumps(
+            [{"filename": "pkg/a.py", "code": "F401", "message": "unused", "location": {"row": 1, "column": 8}}]
+        ),
+    )
+    pyright = write(
+        project,
+        "pyright.json",
+        "No configuration file found.\n"
+        + json.dumps(
+            {
+                "generalDiagnostics": [
+                    {
+                        "file": str(project / "pkg" / "a.py"),
+                        "severity": "error",
+                        "message": "Cannot access attribute",
+                        "rule": "reportAttributeAccessIssue",
+                        "range": {"start": {"line": 9, "character": 4}},
+                    },
+                    {"file": "pkg/a.py", "severity": "information", "message": "ignored"},
+                ]
+            }
+        ),
+    )
+
+    def summary(records):
+        return [(r["file"], r["line"], r["column"], r["rule"], r["severity"]) for r in records]
+
+    assert summary(testops.parse_eslint_json(eslint)) == [
+        ("src/a.ts", 3, 7, "no-unused-vars", "error"),
+        ("src/a.ts", 5, 9, "eqeqeq", "warning"),
+    ]
+    assert summary(testops.parse_ruff_json(ruff)) == [("pkg/a.py", 1, 8, "F401", "error")]
+    assert summary(testops.parse_pyright_json(pyright)) == [("pkg/a.py", 10, 5, "reportAttributeAccessIssue", "error")]
+
+
+def test_parse_text_reporters(project):
+    tsc = write(
+        project,
+        "tsc.log",
+        "\x1b[96msrc/a.ts\x1b[0m(3,7): error TS2322: Type 'string' is not assignable to type 'number'.\n"
+        "Found 1 error. Watching for file changes.\n",
+    )
+    mypy = write(
+        project,
+        "mypy.log",
+        "pkg/a.py:4: error: Incompatible return value type  [return-value]\n"
+        "pkg/b.py:2:5: warning: Unused 'type: ignore' comment\n"
+        "Found 2 errors in 2 files (checked 3 source files)\n",
+    )
+    vitest = write(
+        project,
+        "vitest.log",
+        " FAIL  tests/a.test.ts > math > adds\n"
+        "AssertionError: expected 3 to be 4\n"
+        " ❯ tests/a.test.ts:5:17\n"
+        " FAIL  tests/b.test.ts > loads\n"
+        "Error: boom\n",
+    )
+
+    def summary(records):
+        return [(r["file"], r["line"], r["column"], r["rule"], r["message"]) for r in records]
+
+    assert summary(testops.parse_tsc_text(tsc)) == [
+        ("src/a.ts", 3, 7, "TS2322", "Type 'string' is not assignable to type 'number'.")
+    ]
+    assert summary(testops.parse_mypy_text(mypy)) == [
+        ("pkg/a.py", 4, None, "return-value", "Incompatible return value type"),
+        ("pkg/b.py", 2, 5, None, "Unused 'type: ignore' comment"),
+    ]
+    assert summary(testops.parse_vitest_text(vitest)) == [
+        ("tests/a.test.ts", 5, None, "math > adds", "AssertionError: expected 3 to be 4"),
+        ("tests/b.test.ts", None, None, "loads", "Error: boom"),
+    ]
+
+
+def test_collect_diagnostics_deduplicates(project):
+    message = {"ruleId": "semi", "severity": 2, "message": "Missing semicolon", "line": 1, "column": 2}
+    report = write(
+        project,
+        "eslint.json",
+        json.dumps([{"filePath": "b.ts", "messages": [message]}, {"filePath": "a.ts", "messages": [message, message]}]),
+    )
+
+    records = testops.collect_diagnostics("eslint-json", report, None)
+
+    assert [(record["file"], record.get("count")) for record in records] == [("a.ts", 2), ("b.ts", None)]
+    assert testops.collect_diagnostics(None, report, None) is None
+    assert testops.collect_diagnostics("eslint-json", project / "missing.json", None) is None
+
+
+def test_present_result_pages_diagnostics(project):
+    write(project, "a.py", "x = 1\ny = 2\n")
+    records = [
+        testops.diagnostic("a.py", 2, "E1", "first"),
+        {**testops.diagnostic("a.py", 1, "E2", "second"), "count": 3},
+        testops.diagnostic(None, None, "E3", "third"),
+    ]
+    result = {"returncode": 1, "stdout": "noise", "stderr": "", "diagnostics": records}
+
+    page = testops.present_result(dict(result), offset=0, limit=2)
+
+    assert "stdout" not in page
+    assert page["diagnostics"]["total"] == 5
+    assert page["diagnostics"]["unique"] == 3
+    assert page["diagnostics"]["next_offset"] == 2
+    assert page["diagnostics"]["files"]["a.py"][0] == {
+        "line": 2,
+        "rule": "E1",
+        "severity": "error",
+        "message": "first",
+        "snippet": "y = 2",
+    }
+    last = testops.present_result(dict(result), offset=2, limit=2)
+    assert last["diagnostics"]["next_offset"] is None
+    assert list(last["diagnostics"]["files"]) == ["<unknown>"]
+    assert testops.present_result({"returncode": 1, "stdout": "x" * 5000}, raw=False)["stdout"] == "x" * 4000
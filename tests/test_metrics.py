@@ -0,0 +1,23 @@
+import asyncio
+import json
+
+import pytest
+
+import testops_server as testops
+
+
+def test_instrumented_logs_small_args_and_omits_large_strings(tmp_path, monkeypatch):
+    metrics_file = tmp_path / "metrics.jsonl"
+    monkeypatch.setattr(testops, "METRICS_FILE", str(metrics_file))
+
+    @testops.instrumented
+    async def fake_tool(unified_diff: str, dry_run: bool = True, ctx=None) -> dict:
+        raise ValueError("rejected")
+
+    with pytest.raises(ValueError):
+        asyncio.run(fake_tool(unified_diff="+" * 5000, dry_run=False, ctx=object()))
+
+    event = json.loads(metrics_file.read_text())
+    assert event["tool"] == "fake_tool"
+    assert event["ok"] is False
+    assert event["args"] == {"unified_diff": {"omitted_chars": 5000}, "dry_run": False}
@@ -0,0 +1,58 @@
+import json
+
+import testops_server as testops
+from conftest import write
+
+
+def test_gitignore_rules(tmp_path):
+    write(tmp_path, ".gitignore", "# build output\nnode_modules/\n*.log\n!keep.log\n/dist\n")
+    write(tmp_path, "web/.gitignore", "cache/\n")
+    rules = testops.parse_gitignore(tmp_path / ".gitignore", "") + testops.parse_gitignore(
+        tmp_path / "web" / ".gitignore", "web"
+    )
+
+    assert testops.is_ignored("node_modules", True, rules)
+    assert testops.is_ignored("web/node_modules", True, rules)
+    assert not testops.is_ignored("node_modules", False, rules)
+    assert testops.is_ignored("logs/run.log", False, rules)
+    assert not testops.is_ignored("logs/keep.log", False, rules)
+    assert testops.is_ignored("dist", True, rules)
+    assert not testops.is_ignored("src/dist", True, rules)
+    assert testops.is_ignored("web/cache", True, rules)
+    assert not testops.is_ignored("cache", True, rules)
+
+
+def test_profile_skips_ignored_and_pruned_directories(tmp_path):
+    write(tmp_path, ".gitignore", "generated/\n")
+    write(tmp_path, "package.json", json.dumps({"devDependencies": {"vitest": "^1.6.0"}}))
+    write(tmp_path, "pnpm-lock.yaml", "")
+    write(tmp_path, "tsconfig.json", "{}")
+    write(tmp_path, "src/app.ts", "")
+    write(tmp_path, "src/view.tsx", "")
+    write(tmp_path, "generated/big.ts", "")
+    write(tmp_path, "node_modules/dep/index.js", "")
+
+    profile = testops.build_project_profile(tmp_path)
+
+    assert profile["package_manager"] == "pnpm"
+    assert profile["test_runner"] == "vitest"
+    assert profile["languages"] == {"typescript": 2}
+    assert profile["source_roots"] == ["src"]
+    assert sorted(testops.iter_project_files(tmp_path)) == [
+        ".gitignore",
+        "package.json",
+        "pnpm-lock.yaml",
+        "src/app.ts",
+        "src/view.tsx",
+        "tsconfig.json",
+    ]
+
+
+def test_profile_cache_refreshes_when_markers_change(tmp_path):
+    write(tmp_path, "pyproject.toml", "")
+
+    first = testops.get_project_profile(tmp_path)
+    assert testops.get_project_profile(tmp_path) is first
+    write(tmp_path, "package.json", "{}")
+
+    assert testops.get_project_profile(tmp_path)["package_manager"] == "npm"
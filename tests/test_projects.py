@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+import testops_server as testops
+
+
+def test_resolve_project_root_defaults_and_relative_paths(tmp_path, monkeypatch):
+    (tmp_path / "repo").mkdir()
+    monkeypatch.setattr(testops, "DEFAULT_ROOT", tmp_path)
+
+    assert testops.resolve_project_root(None) == testops.ROOT
+    assert testops.resolve_project_root("repo") == tmp_path / "repo"
+    assert testops.resolve_project_root(str(tmp_path / "repo" / ".." / "repo")) == tmp_path / "repo"
+    with pytest.raises(ValueError, match="does not exist"):
+        testops.resolve_project_root("missing")
+
+
+def test_require_project_rejects_calls_without_a_project(tmp_path, monkeypatch):
+    monkeypatch.setattr(testops, "REQUIRE_PROJECT", True)
+
+    with pytest.raises(ValueError, match="project is required"):
+        testops.resolve_project_root(None)
+    with pytest.raises(ValueError, match="project is required"):
+        asyncio.run(testops.describe_project())
+    assert testops.resolve_project_root(str(tmp_path)) == tmp_path.resolve()
+
+
+def test_each_root_gets_its_own_context(tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+
+    assert testops.get_project(str(first)) is testops.get_project(str(first))
+    assert testops.get_project(str(first)) is not testops.get_project(str(second))
+
+    async def root_seen(project):
+        async with testops.project_session(project):
+            await asyncio.sleep(0.01)
+            return testops.project_root()
+
+    async def both():
+        return await asyncio.gather(root_seen(str(first)), root_seen(str(second)))
+
+    assert asyncio.run(both()) == [first.resolve(), second.resolve()]
@@ -0,0 +1,75 @@
+import asyncio
+import sys
+import time
+
+import testops_server as testops
+from test_run_command import process_alive
+
+
+class RecordingContext:
+    def __init__(self):
+        self.progress: list[float] = []
+
+    async def report_progress(self, progress, total=None, message=None):
+        self.progress.append(progress)
+        await asyncio.sleep(0)
+
+
+def python(code: str) -> list[str]:
+    return [sys.executable, "-c", code]
+
+
+def use_commands(monkeypatch, tests, lint, typecheck):
+    monkeypatch.setattr(testops, "available_cores", lambda: 3)
+    monkeypatch.setattr(testops, "resolve_test_command", lambda pattern=None, files=None: tests)
+    monkeypatch.setattr(testops, "resolve_lint_command", lambda: lint)
+    monkeypatch.setattr(testops, "resolve_typecheck_command", lambda: typecheck)
+
+
+def test_parallel_checks_report_strictly_increasing_progress(project, monkeypatch):
+    chatty = python("import time\nfor i in range(20):\n    print('line', i, flush=True)\n    time.sleep(0.01)")
+    use_commands(monkeypatch, chatty, chatty, chatty)
+    ctx = RecordingContext()
+
+    result = asyncio.run(testops.run_all_checks(project=str(project), ctx=ctx))
+
+    assert result["ok"] is True
+    assert result["parallelism"] == 3
+    assert len(ctx.progress) >= 3
+    assert all(later > earlier for earlier, later in zip(ctx.progress, ctx.progress[1:]))
+
+
+def test_fail_fast_cancels_and_kills_running_checks(project, monkeypatch):
+    pid_file = project / "pids"
+    sleeper = python(f"import os, time\nopen({str(pid_file)!r}, 'a').write(f'{{os.getpid()}}\\n')\ntime.sleep(60)")
+    failing = python("import time, sys\ntime.sleep(0.5)\nsys.exit(1)")
+    use_commands(monkeypatch, sleeper, failing, sleeper)
+    started = time.monotonic()
+
+    result = asyncio.run(testops.run_all_checks(fail_fast=True, project=str(project)))
+
+    assert time.monotonic() - started < 10
+    assert result["ok"] is False
+    assert result["checks"]["lint"]["status"] == "failed"
+    assert result["checks"]["tests"]["status"] == "cancelled"
+    assert result["checks"]["typecheck"]["status"] == "cancelled"
+    pids = [int(line) for line in pid_file.read_text().split()]
+    assert len(pids) == 2
+    assert not any(process_alive(pid) for pid in pids)
+
+
+def test_checks_without_a_command_are_skipped(project, monkeypatch):
+    use_commands(monkeypatch, python("pass"), python("pass"), python("pass"))
+
+    error = "Unable to detect project type for typecheck"
+
+    def no_typecheck():
+        raise RuntimeError(error)
+
+    monkeypatch.setattr(testops, "resolve_typecheck_command", no_typecheck)
+
+    result = asyncio.run(testops.run_all_checks(project=str(project)))
+
+    assert result["ok"] is True
+    assert result["checks"]["typecheck"] == {"status": "skipped", "error": error}
+    assert result["checks"]["tests"]["status"] == "passed"
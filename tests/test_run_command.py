@@ -0,0 +1,75 @@
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+import testops_server as testops
+
+
+def run(cmd, timeout=30):
+    try:
+        return asyncio.run(testops.run_command(cmd, timeout))
+    except RuntimeError as exc:
+        return json.loads(str(exc))
+
+
+def process_alive(pid: int, grace: float = 3.0) -> bool:
+    deadline = time.monotonic() + grace
+    while True:
+        try:
+            status = Path(f"/proc/{pid}/status").read_text()
+        except OSError:
+            return False
+        if "\nState:\tZ" in status:
+            return False
+        if time.monotonic() > deadline:
+            return True
+        time.sleep(0.05)
+
+
+def test_success_spools_full_output_for_read_log(project):
+    result = run([sys.executable, "-c", "print('x' * 40000); print('done')"])
+
+    assert result["returncode"] == 0
+    assert len(result["stdout"]) == testops.TAIL_BYTES
+    assert result["stdout"].endswith("done\n")
+    log = asyncio.run(testops.read_log(result["run_id"], limit=50_000))
+    assert log["size"] == result["log_bytes"] > testops.TAIL_BYTES
+    assert log["text"].startswith("x" * 100)
+    with pytest.raises(ValueError):
+        asyncio.run(testops.read_log("missing"))
+
+
+def test_failure_raises_with_payload(project):
+    result = run([sys.executable, "-c", "import sys; print('boom', file=sys.stderr); sys.exit(3)"])
+
+    assert result["returncode"] == 3
+    assert result["stderr"] == "boom\n"
+    assert "timed_out" not in result
+
+
+def test_timeout_keeps_partial_output(project):
+    started = time.monotonic()
+
+    result = run([sys.executable, "-c", "import time; print('partial', flush=True); time.sleep(60)"], timeout=1)
+
+    assert time.monotonic() - started < 5
+    assert result["timed_out"] is True
+    assert result["stdout"] == "partial\n"
+    assert asyncio.run(testops.read_log(result["run_id"]))["text"] == "partial\n"
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="process groups are POSIX only")
+def test_background_grandchild_does_not_hold_the_run(project, monkeypatch):
+    monkeypatch.setattr(testops, "KILL_GRACE_SEC", 1)
+    started = time.monotonic()
+
+    result = run(["sh", "-c", "sleep 60 & echo $!"], timeout=20)
+
+    assert time.monotonic() - started < 5
+    assert result["returncode"] == 0
+    assert "timed_out" not in result
+    assert not process_alive(int(result["stdout"]))
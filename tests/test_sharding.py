@@ -0,0 +1,28 @@
+import asyncio
+
+import testops_server as testops
+from conftest import write
+
+
+def test_plan_shards_balances_by_duration():
+    timings = {"slow.py": 10.0, "mid.py": 6.0, "fast.py": 4.0}
+
+    plan = testops.plan_shards(["fast.py", "mid.py", "slow.py", "new.py"], 2, timings)
+
+    # new.py has no history, so it is costed at the median known duration.
+    assert sorted((shard["files"], shard["predicted_sec"]) for shard in plan) == [
+        (["fast.py", "slow.py"], 14.0),
+        (["mid.py", "new.py"], 12.0),
+    ]
+    assert testops.plan_shards(["a.py"], 4, {}) == [{"files": ["a.py"], "predicted_sec": 1.0}]
+
+
+def test_list_test_files_follows_pytest_testpaths(project):
+    write(project, "pytest.ini", "[pytest]\ntestpaths = tests\n")
+    write(project, "tests/test_a.py", "def test_a():\n    pass\n")
+    write(project, "tests/unit/test_b.py", "def test_b():\n    pass\n")
+    write(project, "scripts/test_manual.py", "def test_manual():\n    pass\n")
+
+    files = asyncio.run(testops.list_test_files(False))
+
+    assert files == ["tests/test_a.py", "tests/unit/test_b.py"]
@@ -0,0 +1,110 @@
+import asyncio
+import subprocess
+import sys
+import time
+
+import pytest
+
+import testops_server as testops
+from conftest import write
+
+WATCHER = """
+import os, sys, time
+seen = None
+while True:
+    mtime = os.stat(sys.argv[1]).st_mtime_ns
+    if mtime != seen:
+        seen = mtime
+        print("START", flush=True)
+        print("checked", open(sys.argv[1]).read().strip(), flush=True)
+        print("END 0", flush=True)
+    time.sleep(0.02)
+"""
+
+
+def git(root, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.invalid", *args],
+        cwd=root,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture
+def watched(project):
+    write(project, "watched.txt", "one\n")
+    write(project, "other.txt", "x\n")
+    git(project, "init", "-q")
+    git(project, "add", "-A")
+    git(project, "commit", "-q", "-m", "init")
+    return project
+
+
+def with_worker(project, scenario):
+    async def session():
+        command = [sys.executable, "-c", WATCHER, str(project / "watched.txt")]
+        worker = testops.WarmWorker("stub", command, project, r"^START", r"^END (\d+)")
+        try:
+            return await scenario(worker)
+        finally:
+            await worker.stop()
+
+    return asyncio.run(session())
+
+
+async def timed_run(worker):
+    tree = await testops.working_tree_hash()
+    started = time.monotonic()
+    result = await worker.run(["stub"], 10, tree=tree)
+    return result, time.monotonic() - started
+
+
+async def edit_and_think(root, rel_path, content):
+    write(root, rel_path, content)
+    # The watcher reacts while the agent is busy elsewhere, before the next check is requested.
+    await asyncio.sleep(0.5)
+
+
+def test_cycle_finished_before_the_call_is_accepted(watched, monkeypatch):
+    monkeypatch.setattr(testops, "WORKER_SETTLE_SEC", 5)
+
+    async def scenario(worker):
+        first, _ = await timed_run(worker)
+        await edit_and_think(watched, "watched.txt", "two\n")
+        return first, await timed_run(worker), await timed_run(worker)
+
+    first, (second, elapsed), (third, unchanged_elapsed) = with_worker(watched, scenario)
+
+    assert "checked one" in first["stdout"]
+    assert "checked two" in second["stdout"]
+    assert second["worker_generation"] > first["worker_generation"]
+    assert elapsed < 2
+    assert third["worker_generation"] == second["worker_generation"]
+    assert unchanged_elapsed < 1
+
+
+def test_edit_the_watcher_has_not_seen_falls_back_to_a_cold_run(watched, monkeypatch):
+    monkeypatch.setattr(testops, "WORKER_SETTLE_SEC", 0.5)
+
+    async def scenario(worker):
+        first, _ = await timed_run(worker)
+        await edit_and_think(watched, "other.txt", "y\n")
+        second, _ = await timed_run(worker)
+        return first, second
+
+    first, second = with_worker(watched, scenario)
+
+    assert first["returncode"] == 0
+    assert second is None
+
+
+def test_force_bypasses_the_warm_worker(project, monkeypatch):
+    monkeypatch.setattr(testops, "DAEMON_MODE", True)
+    monkeypatch.setattr(testops, "warm_worker_name", lambda check, command: "stub")
+    monkeypatch.setattr(testops, "build_warm_worker", lambda name: pytest.fail("warm worker used"))
+
+    result = asyncio.run(testops.execute_check("typecheck", [sys.executable, "-c", "print('cold')"], 30, None, True))
+
+    assert result["stdout"] == "cold\n"
+    assert "warm" not in result